@@ -0,0 +1,153 @@
+"""Catalog of the campaign creatives in images/ and their cached thumbnails.
+
+Each creative is linked to the PRODUCTS ids it advertises and the customer
+segments (customer types) it targets. The catalog keeps a product id ->
+creatives index, so ads for a vector_search result are found with one dict
+lookup per product.
+
+Full-size creatives are 0.4-2.4 MB. Thumbnails are generated once per size
+bucket into AD_THUMBNAIL_DIR (WebP, or JPEG when Pillow lacks WebP support)
+and pages only ever read those files:
+
+    python ads.py build      # pre-generate every bucket
+"""
+import argparse
+import json
+import os
+import threading
+
+from PIL import Image, ImageOps, features
+
+IMAGES_DIR = os.getenv("AD_IMAGES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "images"))
+THUMBNAIL_DIR = os.getenv("AD_THUMBNAIL_DIR", os.path.join(IMAGES_DIR, ".thumbnails"))
+# Bucket name -> maximum width in pixels; a request is served from the smallest bucket that fits
+THUMBNAIL_BUCKETS = {"small": 240, "medium": 480, "large": 960}
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+THUMBNAIL_QUALITY = 80
+
+AD_CREATIVES = [
+    {"id": "Ad_01", "file": "Ad_01_Digital_Account.PNG", "title": "Open a digital savings account in minutes",
+     "product_ids": (1, 38, 55), "segments": ("individual",)},
+    {"id": "Ad_02", "file": "Ad_02_InsurancePayments_Offers.jpg", "title": "Cashback on insurance payments",
+     "product_ids": (16, 11, 33, 34), "segments": ("individual",)},
+    {"id": "Ad_03", "file": "Ad_03_CashBack.jpg", "title": "Cashback on top brands",
+     "product_ids": (16, 39, 50), "segments": ("individual",)},
+    {"id": "Ad_04", "file": "Ad_04_Shoping_Card_easydiner.jpg", "title": "Dining offers with EazyDiner",
+     "product_ids": (42, 52, 11), "segments": ("individual",)},
+    {"id": "Ad_05", "file": "Ad_05_Travel_discount.jpg", "title": "Instant discount on travel",
+     "product_ids": (18, 45, 46, 47), "segments": ("individual",)},
+    {"id": "Ad_06", "file": "Ad_06_Spykar_Shopping.jpg", "title": "Exclusive prices at Spykar",
+     "product_ids": (14, 11, 20, 38), "segments": ("individual",)},
+    {"id": "Ad_07", "file": "Ad_07_Reliance_digital.jpg", "title": "Savings at Reliance Digital",
+     "product_ids": (14, 20, 11), "segments": ("individual",)},
+    {"id": "Ad_08", "file": "Ad_08_iphone16_offer.jpg", "title": "Upgrade to iPhone 16 with EMIs",
+     "product_ids": (12, 44, 25), "segments": ("individual",)},
+    {"id": "Ad_09", "file": "Ad_09_Travel_Forex_card.jpg", "title": "Forex prepaid card for travel",
+     "product_ids": (54, 21, 18), "segments": ("individual", "organization")},
+    {"id": "Ad_10", "file": "Ad_10_Students_Forex_Card.jpg", "title": "Student forex card",
+     "product_ids": (54, 21, 58), "segments": ("individual",)},
+    {"id": "Ad_11", "file": "Ad_11_BookMyShow_Coral_PrepaidCard.jpg", "title": "Coral prepaid card with BookMyShow offers",
+     "product_ids": (21, 53), "segments": ("individual",)},
+    {"id": "Ad_12", "file": "Ad_12_MultiCurrency_PrepaidCard.jpg", "title": "Multi-currency prepaid card",
+     "product_ids": (54, 21), "segments": ("individual", "organization")},
+    {"id": "Ad_13", "file": "Ad_13_Rupay_CreditCard.jpg", "title": "RuPay credit card on UPI",
+     "product_ids": (11, 36, 37), "segments": ("individual",)},
+    {"id": "Ad_14", "file": "Ad_14_Amazon_Shopping_CreditCard.jpg", "title": "Amazon vouchers with our credit card",
+     "product_ids": (41, 14), "segments": ("individual",)},
+    {"id": "Ad_15", "file": "Ad_15_GoldBonds.jpg", "title": "Sovereign gold bonds",
+     "product_ids": (93, 32, 75), "segments": ("individual", "organization")},
+]
+
+
+def bucket_for(width):
+    """Smallest bucket at least width pixels wide, or the largest one"""
+    for name, bucket_width in sorted(THUMBNAIL_BUCKETS.items(), key=lambda item: item[1]):
+        if bucket_width >= width:
+            return name
+    return max(THUMBNAIL_BUCKETS, key=THUMBNAIL_BUCKETS.get)
+
+
+class AdCatalog:
+    def __init__(self, creatives=AD_CREATIVES, images_dir=IMAGES_DIR, thumbnail_dir=THUMBNAIL_DIR,
+                 image_format=THUMBNAIL_FORMAT):
+        self.creatives = {c["id"]: c for c in creatives}
+        self.images_dir = images_dir
+        self.thumbnail_dir = thumbnail_dir
+        self.image_format = image_format
+        self.by_product = {}
+        for creative in creatives:
+            for product_id in creative["product_ids"]:
+                self.by_product.setdefault(product_id, []).append(creative["id"])
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def match(self, products, segment=None, limit=3):
+        """Creatives for products ordered best match first, filtered to the customer's segment"""
+        matched = []
+        for product in products:
+            for creative_id in self.by_product.get(product["id"], ()):
+                creative = self.creatives[creative_id]
+                if creative_id not in matched and (segment is None or segment in creative["segments"]):
+                    matched.append(creative_id)
+                    if len(matched) == limit:
+                        return [self.creatives[c] for c in matched]
+        return [self.creatives[c] for c in matched]
+
+    def thumbnail_path(self, creative_id, width=THUMBNAIL_BUCKETS["medium"]):
+        """Path of the cached thumbnail for the bucket that fits width, generated on first use"""
+        key = (creative_id, bucket_for(width))
+        path = self._paths.get(key)
+        if path is None:
+            with self._lock:
+                path = self._paths.get(key) or self._build(*key)
+                self._paths[key] = path
+        return path
+
+    def _build(self, creative_id, bucket):
+        source = os.path.join(self.images_dir, self.creatives[creative_id]["file"])
+        # Keyed by the source's mtime so a replaced creative gets new thumbnails
+        stat = os.stat(source)
+        extension = "webp" if self.image_format == "WEBP" else "jpg"
+        path = os.path.join(self.thumbnail_dir, f"{creative_id}_{bucket}_{stat.st_mtime_ns}.{extension}")
+        if os.path.exists(path):
+            return path
+
+        max_width = THUMBNAIL_BUCKETS[bucket]
+        with Image.open(source) as image:
+            # Lets the JPEG decoder downscale by a power of two instead of decoding full size
+            image.draft("RGB", (max_width, max_width * image.height // image.width))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_width, image.height), Image.LANCZOS)
+            if self.image_format == "JPEG" and image.mode != "RGB":
+                image = image.convert("RGB")
+            os.makedirs(self.thumbnail_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            if self.image_format == "WEBP":
+                image.save(tmp_path, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+            else:
+                image.save(tmp_path, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+        # Atomic, so other processes never read a half-written file
+        os.replace(tmp_path, path)
+        return path
+
+    def build_thumbnails(self, buckets=None):
+        """Generates every missing thumbnail; returns {creative id: {bucket: path}}"""
+        buckets = buckets or list(THUMBNAIL_BUCKETS)
+        return {creative_id: {bucket: self.thumbnail_path(creative_id, THUMBNAIL_BUCKETS[bucket]) for bucket in buckets}
+                for creative_id in self.creatives}
+
+
+CATALOG = AdCatalog()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--bucket", action="append", choices=list(THUMBNAIL_BUCKETS),
+                        help="bucket to build; repeatable, default all")
+    args = parser.parse_args()
+    print(json.dumps(CATALOG.build_thumbnails(args.bucket), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,40 @@
 import os
+import heapq
+import json
 import sqlite3
+import faiss
+import numpy as np
 import streamlit as st
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.vectorstores import FAISS
+from contextlib import nullcontext
+from functools import lru_cache
+from itertools import islice
 from typing import List, Dict, Optional
+import ads
+import partitions
+import profiling
+import rendering
+from singleflight import SingleFlight
 
-DB_FILE = "customer_data_expanded.db"
+DB_FILE = os.getenv("DB_FILE", "customer_data_expanded.db")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
+# Optional OpenAI-compatible endpoint, e.g. the mock server in mock_openai.py
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# "openai" for the real models, "stub" for the offline models in stub_backends.py
+RECOMMENDER_BACKEND = os.getenv("RECOMMENDER_BACKEND", "openai")
+# Optional split of the customer tables across several files, e.g. "hash:4"; see partitions.py
+PARTITIONS = partitions.PartitionMap(DB_FILE, os.getenv("DB_PARTITIONS", ""))
+
+def owned_rows(db_file, rows):
+    """Seed rows whose customer belongs in db_file"""
+    return [row for row in rows if PARTITIONS.path_for(row[0]) == db_file]
+
+def init_db(db_file=None):
+    db_file = db_file or DB_FILE
+    conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS customer_profile_org (
@@ -71,7 +94,7 @@ def init_db():
         ('ORG_US_011', 'Renewable Energy', 'Green Bonds, Project Financing, Treasury Services', 'Solar and Wind Projects, Carbon Neutrality', '100M-150M', '300-500'),
         ('ORG_US_012', 'Hospitality and Tourism', 'Business Loans, Revenue Management Tools, Digital Marketing', 'Luxury Experiences, Global Outreach', '80M-100M', '600-800')
     ]
-    cursor.executemany('INSERT OR REPLACE INTO customer_profile_org VALUES (?, ?, ?, ?, ?, ?)', org_data)
+    cursor.executemany('INSERT OR IGNORE INTO customer_profile_org VALUES (?, ?, ?, ?, ?, ?)', owned_rows(db_file, org_data))
 
     # Populate Customer Profile (Individual) table with expanded data
     ind_data = [
@@ -91,7 +114,7 @@ def init_db():
         ('CUST2025N', 50, 'F', 'Boston', 'Art, Culture, Travel', 'Art Investments, Luxury Travel Cards', 150000, 'Graduate', 'Art Curator'),
         ('CUST2025O', 33, 'M', 'Austin', 'Gaming, Streaming, Tech', 'Gaming Subscriptions, BNPL', 78000, 'Graduate', 'Content Creator')
     ]
-    cursor.executemany('INSERT OR REPLACE INTO customer_profile_ind VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', ind_data)
+    cursor.executemany('INSERT OR IGNORE INTO customer_profile_ind VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', owned_rows(db_file, ind_data))
 
     # Populate Social Media Sentiment table with expanded data
     sentiment_data = [
@@ -122,7 +145,7 @@ def init_db():
         ('ORG_US_011', '4567', 'LinkedIn', 'New solar project underway. Aiming for carbon neutrality!', '3/15/25 10:45', 0.9, 'Sustainability Interest'),
         ('ORG_US_012', '8901', 'Instagram', 'Our new luxury resort is now open! Book your stay!', '2/28/25 12:00', 0.9, 'Luxury Travel Interest')
     ]
-    cursor.executemany('INSERT OR REPLACE INTO social_media_sentiment VALUES (?, ?, ?, ?, ?, ?, ?)', sentiment_data)
+    cursor.executemany('INSERT OR IGNORE INTO social_media_sentiment VALUES (?, ?, ?, ?, ?, ?, ?)', owned_rows(db_file, sentiment_data))
 
     # Populate Transaction History table with expanded data
     transaction_data = [
@@ -161,12 +184,122 @@ def init_db():
         ('ORG_US_004', 233, 'Inventory Loan', 'Seasonal Stock', 2000000, '1/20/2025', 'Business Loan'),
         ('CUST2025B', 234, 'Travel Booking', 'Adventure Trip', 3000, '3/25/2025', 'Travel Credit Card')
     ]
-    cursor.executemany('INSERT OR REPLACE INTO transaction_history VALUES (?, ?, ?, ?, ?, ?, ?)', transaction_data)
+    cursor.executemany('INSERT OR IGNORE INTO transaction_history VALUES (?, ?, ?, ?, ?, ?, ?)', owned_rows(db_file, transaction_data))
 
+    init_customer_index(cursor)
+    init_change_log(cursor)
+
+    conn.commit()
+    conn.close()
+
+def init_customer_index(cursor):
+    """Sorted id listing for the customer picker, kept in sync with both profile tables by triggers"""
+    created = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customer_index'"
+    ).fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_index (
+            customer_id TEXT PRIMARY KEY,
+            customer_type TEXT
+        ) WITHOUT ROWID''')
+    for table, customer_type in (("customer_profile_ind", "individual"), ("customer_profile_org", "organization")):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_index_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT OR IGNORE INTO customer_index VALUES (NEW.customer_id, '{customer_type}');
+            END''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_index_delete AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM customer_index WHERE customer_id = OLD.customer_id;
+            END''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_index_update AFTER UPDATE OF customer_id ON {table}
+            BEGIN
+                DELETE FROM customer_index WHERE customer_id = OLD.customer_id;
+                INSERT OR IGNORE INTO customer_index VALUES (NEW.customer_id, '{customer_type}');
+            END''')
+        # Backfill rows written before the index existed; afterwards the triggers keep it current
+        if created:
+            cursor.execute(f"INSERT OR IGNORE INTO customer_index SELECT customer_id, '{customer_type}' FROM {table}")
+
+def init_segment_tables(cursor):
+    """Output of the offline clustering job in segments.py, read by fast mode"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_segment (
+            segment_id INTEGER PRIMARY KEY,
+            centroid BLOB,
+            size INTEGER,
+            prototype_customer_id TEXT,
+            products TEXT,
+            rationale TEXT,
+            built_at TEXT
+        )''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_segment_member (
+            customer_id TEXT PRIMARY KEY,
+            segment_id INTEGER,
+            distance REAL
+        ) WITHOUT ROWID''')
+
+CHANGE_TRACKED_TABLES = ("customer_profile_ind", "customer_profile_org", "social_media_sentiment", "transaction_history")
+# Columns generate_similarity_query reads; updates to other columns (e.g. the scores
+# written by sentiment.py) do not change the precomputed products and are not queued
+CHANGE_TRACKED_COLUMNS = {
+    "customer_profile_ind": ("customer_id", "age", "gender", "occupation", "location", "income_per_year",
+                             "education", "interests", "preferences"),
+    "customer_profile_org": ("customer_id", "industry", "revenue_range", "employee_count_range",
+                             "financial_needs", "preferences"),
+    "social_media_sentiment": ("customer_id", "platform", "content"),
+    "transaction_history": ("customer_id", "transaction_type", "category", "amount_usd"),
+}
+
+def init_change_log(cursor):
+    """Change log filled by triggers on the customer tables, drained by the worker in cdc.py"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_change_log (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id TEXT,
+            table_name TEXT,
+            changed_at REAL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+        )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_customer ON customer_change_log (customer_id)")
+    for table in CHANGE_TRACKED_TABLES:
+        # Replaced by {table}_change_update_of, which only fires for the tracked columns
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}_change_update")
+        columns = ", ".join(CHANGE_TRACKED_COLUMNS[table])
+        for name, event, row in (("insert", "INSERT", "NEW"), ("update_of", f"UPDATE OF {columns}", "NEW"),
+                                 ("delete", "DELETE", "OLD")):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_change_{name} AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO customer_change_log (customer_id, table_name) VALUES ({row}.customer_id, '{table}');
+                END''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS {0}_change_rekey AFTER UPDATE OF customer_id ON {0}
+            WHEN OLD.customer_id IS NOT NEW.customer_id
+            BEGIN
+                INSERT INTO customer_change_log (customer_id, table_name) VALUES (OLD.customer_id, '{0}');
+            END'''.format(table))
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS precomputed_recommendations (
+            customer_id TEXT PRIMARY KEY,
+            query_embedding BLOB,
+            products TEXT,
+            computed_at REAL,
+            source_change_id INTEGER
+        ) WITHOUT ROWID''')
+
+def init_shared_db():
+    """Tables shared by all partitions; they stay in DB_FILE"""
+    conn = sqlite3.connect(DB_FILE)
+    init_segment_tables(conn.cursor())
     conn.commit()
     conn.close()
 
-init_db()
+for partition_file in PARTITIONS.all_paths():
+    init_db(partition_file)
+init_shared_db()
 
 PRODUCTS = [
     {"id": 1, "name": "Savings Account", "description": "For everyday transactions and accumulating funds"},
@@ -277,28 +410,81 @@ PRODUCTS = [
 ]
 
 
+def get_embedding_model():
+    if RECOMMENDER_BACKEND == "stub":
+        from stub_backends import StubEmbeddings
+        return StubEmbeddings()
+    # Compatible servers generally accept raw text only, so skip tiktoken pre-tokenisation for them
+    return OpenAIEmbeddings(model="text-embedding-3-large", openai_api_key=OPENAI_API_KEY,
+                            openai_api_base=OPENAI_BASE_URL, check_embedding_ctx_length=OPENAI_BASE_URL is None)
+
+@lru_cache(maxsize=1)
+def get_chat_model():
+    """Shared chat client so its HTTP connection pool is reused across requests"""
+    if RECOMMENDER_BACKEND == "stub":
+        from stub_backends import StubChatModel
+        return StubChatModel()
+    return ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY, openai_api_base=OPENAI_BASE_URL)
+
 def initialize_product_vector_store():
-    embedding_model = OpenAIEmbeddings(model="text-embedding-3-large", openai_api_key=OPENAI_API_KEY)
+    embedding_model = get_embedding_model()
     product_texts = [p["description"] for p in PRODUCTS]
     product_metadata = [{"id": p["id"], "name": p["name"]} for p in PRODUCTS]
     return FAISS.from_texts(texts=product_texts, embedding=embedding_model, metadatas=product_metadata), embedding_model
 
 VECTOR_STORE, EMBEDDING_MODEL = initialize_product_vector_store()
 
-def get_all_customer_ids():
-    conn = sqlite3.connect(DB_FILE)
+def list_customer_ids(db_file):
+    conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
-    cursor.execute("SELECT customer_id FROM customer_profile_ind")
-    ind_ids = [row[0] for row in cursor.fetchall()]
-    cursor.execute("SELECT customer_id FROM customer_profile_org")
-    org_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT customer_id FROM customer_index ORDER BY customer_id")
+    customer_ids = [row[0] for row in cursor.fetchall()]
     conn.close()
-    return sorted(ind_ids + org_ids)
+    return customer_ids
 
-def get_customer_details(customer_id):
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
+def get_all_customer_ids():
+    # Each partition returns its ids sorted, so a k-way merge keeps the global order
+    return list(heapq.merge(*PARTITIONS.fan_out(list_customer_ids).values()))
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def search_partition(db_file, prefix, after, limit):
+    conn = sqlite3.connect(db_file)
+    page = search_customer_ids(prefix, after, limit, conn)
+    conn.close()
+    return page
+
+def search_customer_ids(prefix="", after=None, limit=50, conn=None):
+    """One page of ids starting with prefix, using keyset pagination on the index primary key.
+
+    Without conn, every partition that can hold the prefix returns a page and
+    the first limit ids of their merge are kept.
+    """
+    if conn is None:
+        pages = PARTITIONS.fan_out(lambda db_file: search_partition(db_file, prefix, after, limit),
+                                   PARTITIONS.paths_for_prefix(prefix))
+        return list(islice(heapq.merge(*pages.values()), limit))
+    clauses, params = [], []
+    if prefix:
+        clauses.append("customer_id >= ? AND customer_id < ?")
+        params += [prefix, prefix_upper_bound(prefix)]
+    if after is not None:
+        clauses.append("customer_id > ?")
+        params.append(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(
+        f"SELECT customer_id FROM customer_index {where} ORDER BY customer_id LIMIT ?", (*params, limit)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+def get_customer_details(customer_id, conn=None):
+    owns_conn = conn is None
+    if owns_conn:
+        conn = sqlite3.connect(PARTITIONS.path_for(customer_id))
     cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
     customer_data = {}
     
     cursor.execute("SELECT * FROM customer_profile_ind WHERE customer_id = ?", (customer_id,))
@@ -317,9 +503,25 @@ def get_customer_details(customer_id):
     cursor.execute("SELECT * FROM transaction_history WHERE customer_id = ?", (customer_id,))
     customer_data["transactions"] = [dict(row) for row in cursor.fetchall()]
     
-    conn.close()
+    if owns_conn:
+        conn.close()
     return customer_data
 
+def get_customers(customer_ids):
+    """Details for many customers in input order; each partition is read on its own thread"""
+    groups = PARTITIONS.group(customer_ids)
+
+    def read_partition(db_file):
+        conn = sqlite3.connect(db_file)
+        details = {customer_id: get_customer_details(customer_id, conn) for customer_id in groups[db_file]}
+        conn.close()
+        return details
+
+    found = {}
+    for details in PARTITIONS.fan_out(read_partition, groups).values():
+        found.update(details)
+    return [found[customer_id] for customer_id in customer_ids]
+
 def generate_similarity_query(customer_data):
     query_parts = []
     
@@ -372,222 +574,253 @@ def generate_similarity_query(customer_data):
 
     return ". ".join(query_parts) + ". What banking products match my needs?"
 
+def format_search_results(results):
+    return [{
+        "id": doc.metadata["id"],
+        "name": doc.metadata["name"],
+        "description": doc.page_content,
+        "similarity": f"{100 * (1 / (1 + score)):.1f}%"
+    } for doc, score in results if (100 * (1 / (1 + score))) > 42]
+
 def vector_search(customer_data):
     try:
         query_text = generate_similarity_query(customer_data)
         results = VECTOR_STORE.similarity_search_with_score(query_text, k=10)
-        return [{
-            "id": doc.metadata["id"],
-            "name": doc.metadata["name"],
-            "description": doc.page_content,
-            "similarity": f"{100 * (1 / (1 + score)):.1f}%"
-        } for doc, score in results if (100 * (1 / (1 + score))) > 42]
+        return format_search_results(results)
     except Exception as e:
         st.error(f"Search error: {str(e)}")
         return []
 
-def get_llm_recommendations(customer_data, products):
-    if not OPENAI_API_KEY:
-        return "OpenAI API key missing"
-    
-    llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY)
-    product_list = "\n".join([f"- {p['name']}: {p['description']}" for p in products])
-    
-    prompt = ChatPromptTemplate.from_template("""
+RECOMMENDATION_PROMPT = ChatPromptTemplate.from_template("""
         Analyze profile and recommend products:
         Customer Type: {type}
         Key Details: {details}
         Products: {products}
         Format: 1. Name - Reason - Match Score
     """)
-    
-    return (prompt | llm | StrOutputParser()).invoke({
+
+def recommendation_inputs(customer_data, products):
+    return {
         "type": customer_data.get("type", "unknown"),
         "details": str({k:v for k,v in customer_data.items() if k not in ['social_media','transactions']}),
-        "products": product_list
-    })
+        "products": "\n".join([f"- {p['name']}: {p['description']}" for p in products])
+    }
 
+def get_llm_recommendations(customer_data, products):
+    if RECOMMENDER_BACKEND != "stub" and not OPENAI_API_KEY:
+        return "OpenAI API key missing"
+    
+    llm = get_chat_model()
+    return (RECOMMENDATION_PROMPT | llm | StrOutputParser()).invoke(recommendation_inputs(customer_data, products))
+
+@st.cache_resource
+def get_recommendation_flights():
+    # Streamlit re-executes this script on every rerun; cache_resource keeps one
+    # group per process so concurrent sessions actually share in-flight work.
+    return SingleFlight()
+
+RECOMMENDATION_FLIGHTS = get_recommendation_flights()
+
+def get_customer_version(customer_id, conn=None):
+    """Changes whenever this customer's rows are written, so stale in-flight results are not shared.
+
+    Every write queues a change with a new AUTOINCREMENT change_id; once cdc.py drains
+    it, the precomputed row keeps the id in source_change_id, so the value never goes back.
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = sqlite3.connect(PARTITIONS.path_for(customer_id))
+    try:
+        return conn.execute('''
+            SELECT MAX(version) FROM (
+                SELECT MAX(change_id) AS version FROM customer_change_log WHERE customer_id = ?
+                UNION ALL
+                SELECT source_change_id FROM precomputed_recommendations WHERE customer_id = ?
+            )''', (customer_id, customer_id)).fetchone()[0]
+    finally:
+        if owns_conn:
+            conn.close()
+
+def get_precomputed_products(customer_id, conn=None):
+    """Products stored by the cdc.py worker, or None if missing or a change is still queued"""
+    owns_conn = conn is None
+    if owns_conn:
+        conn = sqlite3.connect(PARTITIONS.path_for(customer_id))
+    try:
+        row = conn.execute('''
+            SELECT products FROM precomputed_recommendations
+            WHERE customer_id = ?
+              AND NOT EXISTS (SELECT 1 FROM customer_change_log WHERE customer_id = ?)''',
+            (customer_id, customer_id)).fetchone()
+    finally:
+        if owns_conn:
+            conn.close()
+    return json.loads(row[0]) if row else None
+
+def compute_recommendations(customer_id, include_rationale=True, pool=None, use_precomputed=True):
+    """(customer, products, rationale); use_precomputed=False always runs the live vector search"""
+    products = None
+    with profiling.stage("get_customer_details"):
+        if pool is not None:
+            with pool.connection_for(customer_id) as conn:
+                customer = get_customer_details(customer_id, conn)
+                if use_precomputed:
+                    products = get_precomputed_products(customer_id, conn)
+        else:
+            conn = sqlite3.connect(PARTITIONS.path_for(customer_id))
+            customer = get_customer_details(customer_id, conn)
+            if use_precomputed:
+                products = get_precomputed_products(customer_id, conn)
+            conn.close()
+    if not customer.get("type"):
+        return customer, [], None
+
+    if products is None:
+        with profiling.stage("vector_search"):
+            products = vector_search(customer)
+    rationale = None
+    if products and include_rationale:
+        with profiling.stage("get_llm_recommendations"):
+            rationale = get_llm_recommendations(customer, products)
+    return customer, products, rationale
+
+def get_recommendations(customer_id, include_rationale=True, pool=None):
+    """Returns (customer, products, rationale); concurrent identical requests share one computation"""
+    if pool is not None:
+        with pool.connection_for(customer_id) as conn:
+            version = get_customer_version(customer_id, conn)
+    else:
+        version = get_customer_version(customer_id)
+    key = (customer_id, version, include_rationale)
+    return RECOMMENDATION_FLIGHTS.do(key, compute_recommendations, customer_id, include_rationale, pool)
+
+@st.cache_resource(max_entries=2)
+def load_segment_index(db_file, built_at):
+    """Centroid search index and cached recommendations for one segment build"""
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute("SELECT segment_id, centroid, products, rationale FROM customer_segment ORDER BY segment_id").fetchall()
+    conn.close()
+    centroids = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+    index = faiss.IndexFlatL2(centroids.shape[1])
+    index.add(centroids)
+    return index, [row[0] for row in rows], {row[0]: (json.loads(row[2]), row[3]) for row in rows}
+
+def get_segment_recommendations(customer_id):
+    """Fast mode: serve the precomputed recommendation of the customer's segment.
+
+    Returns (customer, products, rationale) like get_recommendations, or None when
+    no segments have been built. Customers clustered by the last build use their
+    stored assignment; anyone newer is embedded and matched to the nearest centroid.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    built_at = conn.execute("SELECT MAX(built_at) FROM customer_segment").fetchone()[0]
+    member = conn.execute(
+        "SELECT segment_id FROM customer_segment_member WHERE customer_id = ?", (customer_id,)
+    ).fetchone()
+    # Segment tables are in DB_FILE; with partitioning the customer may live elsewhere
+    customer = get_customer_details(customer_id, conn if PARTITIONS.path_for(customer_id) == DB_FILE else None)
+    conn.close()
+    if built_at is None:
+        return None
+    if not customer.get("type"):
+        return customer, [], None
+
+    index, segment_ids, segment_recommendations = load_segment_index(DB_FILE, built_at)
+    if member:
+        segment_id = member[0]
+    else:
+        query = np.array([EMBEDDING_MODEL.embed_query(generate_similarity_query(customer))], dtype=np.float32)
+        _, nearest = index.search(query, 1)
+        segment_id = segment_ids[nearest[0][0]]
+    products, rationale = segment_recommendations[segment_id]
+    return customer, products, rationale
+
+
+@st.cache_resource
+def get_ad_catalog():
+    """Ad catalog with the thumbnails the page uses generated up front, once per process"""
+    ads.CATALOG.build_thumbnails([ads.bucket_for(rendering.AD_WIDTH)])
+    return ads.CATALOG
 
 def display_customer_profile(customer):
     """Create a modern, visually appealing customer profile display"""
-    st.markdown("""
-        <style>
-            .profile-card { 
-                background: #ffffff; 
-                border-radius: 10px; 
-                padding: 20px; 
-                box-shadow: 0 2px 5px rgba(0,0,0,0.1); 
-                margin-bottom: 20px;
-            }
-            .section-title {
-                color: #1a73e8;
-                font-size: 24px;
-                margin-bottom: 15px;
-                border-bottom: 2px solid #1a73e8;
-                padding-bottom: 5px;
-            }
-            .info-grid {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 15px;
-            }
-            .info-item {
-                background: #f8f9fa;
-                padding: 10px;
-                border-radius: 5px;
-            }
-            .social-post {
-                background: #f1f8ff;
-                padding: 15px;
-                border-radius: 8px;
-                margin: 10px 0;
-                border-left: 4px solid #1a73e8;
-            }
-        </style>
-    """, unsafe_allow_html=True)
-
-    # Profile Header
-    if customer.get('type') == 'individual':
-        st.markdown('<div class="profile-card"><h2 class="section-title">👤 Individual Profile</h2>', unsafe_allow_html=True)
-        st.markdown('<div class="info-grid">', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>ID:</b> {customer.get("customer_id", "N/A")}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>Age:</b> {customer.get("age", "N/A")} years</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>Gender:</b> {customer.get("gender", "N/A")}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>Location:</b> {customer.get("location", "N/A")}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>Occupation:</b> {customer.get("occupation", "N/A")}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>Education:</b> {customer.get("education", "N/A")}</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-        st.metric("Annual Income", f"${customer.get('income_per_year', 0):,}")
-        st.markdown(f'<b>Interests:</b> {customer.get("interests", "N/A")}', unsafe_allow_html=True)
-        st.markdown(f'<b>Preferences:</b> {customer.get("preferences", "N/A")}', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    elif customer.get('type') == 'organization':
-        st.markdown('<div class="profile-card"><h2 class="section-title">🏢 Organization Profile</h2>', unsafe_allow_html=True)
-        st.markdown('<div class="info-grid">', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>ID:</b> {customer.get("customer_id", "N/A")}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>Industry:</b> {customer.get("industry", "N/A")}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>Revenue:</b> {customer.get("revenue_range", "N/A")}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="info-item"><b>Employees:</b> {customer.get("employee_count_range", "N/A")}</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-        st.markdown(f'<b>Financial Needs:</b> {customer.get("financial_needs", "N/A")}', unsafe_allow_html=True)
-        st.markdown(f'<b>Preferences:</b> {customer.get("preferences", "N/A")}', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # Social Media Insights
-    if customer.get('social_media'):
-        st.markdown('<div class="profile-card"><h2 class="section-title">💬 Social Media Insights</h2>', unsafe_allow_html=True)
-        for post in customer['social_media'][:3]:
-            sentiment_color = "#2ecc71" if float(post.get('sentiment_score', 0)) > 0 else "#e74c3c"
-            st.markdown(f"""
-                <div class="social-post">
-                    <b>{post.get('platform', 'Platform')} | {post.get('timestamp', 'Date')}</b><br>
-                    <i>{post.get('content', 'No content')}</i><br>
-                    <small style="color:{sentiment_color}">Sentiment: {post.get('sentiment_score', 'N/A')}</small> | 
-                    <small>Intent: {post.get('intent', 'N/A')}</small>
-                </div>
-            """, unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # Transaction Summary
-    if customer.get('transactions'):
-        st.markdown('<div class="profile-card"><h2 class="section-title">💳 Transaction Summary</h2>', unsafe_allow_html=True)
-        total_spend = sum(tx.get('amount_usd', 0) for tx in customer['transactions'])
-        categories = {}
-        for tx in customer['transactions']:
-            cat = tx.get('category', 'Other')
-            categories[cat] = categories.get(cat, 0) + tx.get('amount_usd', 0)
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Total Transactions", len(customer['transactions']))
-            st.metric("Total Spend", f"${total_spend:,}")
-        with col2:
-            st.markdown("### Top Categories")
-            for cat, amount in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:3]:
-                st.markdown(f"- **{cat}**: ${amount:,}")
-        st.markdown('</div>', unsafe_allow_html=True)
+    rendering.render_customer_profile(customer)
+
+PICKER_PAGE_SIZE = 50
+
+@st.cache_data(ttl=30, show_spinner=False)
+def cached_customer_page(prefix, after, limit):
+    return search_customer_ids(prefix, after, limit)
+
+def customer_picker():
+    """Searchable, paginated customer selector; only one page of ids is read per rerun"""
+    prefix = st.text_input("Search Customer ID", key="customer_search").strip().upper()
+    state = st.session_state
+    if state.get("picker_prefix") != prefix:
+        state.picker_prefix = prefix
+        state.picker_cursors = [None]
+    cursors = state.picker_cursors
+
+    # Fetch one extra row to learn whether a next page exists
+    customer_ids = cached_customer_page(prefix, cursors[-1], PICKER_PAGE_SIZE + 1)
+    has_next = len(customer_ids) > PICKER_PAGE_SIZE
+    customer_ids = customer_ids[:PICKER_PAGE_SIZE]
+
+    prev_col, next_col = st.columns(2)
+    if prev_col.button("◀ Previous", key="picker_prev", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if next_col.button("Next ▶", key="picker_next", disabled=not has_next):
+        cursors.append(customer_ids[-1])
+        st.rerun()
+
+    if not customer_ids:
+        st.info("No customers match this search")
+        return None
+    return st.selectbox("Select Customer", customer_ids, key="customer_select")
 
 def main():
     st.set_page_config(page_title="Banking Recommender", page_icon="🏦", layout="wide")
     
-    # Custom CSS for recommendations
-    st.markdown("""
-        <style>
-            .recommendation-card {
-                background: #ffffff;
-                border-radius: 10px;
-                padding: 15px;
-                margin: 10px 0;
-                box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-                transition: transform 0.2s;
-            }
-            .recommendation-card:hover {
-                transform: translateY(-5px);
-            }
-            .recommendation-title {
-                color: #2e7d32;
-                font-size: 20px;
-                margin-bottom: 8px;
-            }
-            .recommendation-score {
-                background: #e8f5e9;
-                padding: 5px 10px;
-                border-radius: 15px;
-                font-size: 12px;
-                color: #2e7d32;
-            }
-            .llm-recommendations {
-                background: #f8f9fa;
-                padding: 20px;
-                border-radius: 10px;
-                margin-top: 20px;
-            }
-            .control-container {
-                display: flex;
-                gap: 20px;
-                align-items: center;
-                margin-bottom: 20px;
-            }
-        </style>
-    """, unsafe_allow_html=True)
+    rendering.inject_css()
 
     st.title("🏦 Banking Product Recommender")
     
     # Controls in a single row
     with st.container():
-        st.markdown('<div class="control-container">', unsafe_allow_html=True)
-        customer_id = st.selectbox("Select Customer", get_all_customer_ids(), key="customer_select")
-        st.markdown('<div style="margin-top: 8px;">', unsafe_allow_html=True)  # Align button vertically
-        if st.button("Generate Recommendations", key="generate_button"):
+        customer_id = customer_picker()
+        fast_mode = st.toggle("Fast mode (segment recommendations)", key="fast_mode")
+        if st.button("Generate Recommendations", key="generate_button", disabled=customer_id is None):
             with st.spinner("Analyzing..."):
-                customer = get_customer_details(customer_id)
-                if not customer:
+                profile = profiling.profile_requested(st.query_params.get("profile"))
+                with profiling.profile_run(customer_id) if profile else nullcontext() as run:
+                    result = get_segment_recommendations(customer_id) if fast_mode else None
+                    if result is None:
+                        if fast_mode:
+                            st.info("No customer segments have been built yet; using the per-customer pipeline")
+                        # A profiled run computes on this thread rather than waiting on another session's flight
+                        result = compute_recommendations(customer_id) if profile else get_recommendations(customer_id)
+                if run is not None:
+                    st.caption(f"Profile written to {os.path.basename(run.paths['report'])}")
+                customer, products, rationale = result
+                if not customer.get("type"):
                     st.error("Customer not found")
                     return
                 
                 with st.expander("Customer Profile", expanded=True):
                     display_customer_profile(customer)
                 
-                products = vector_search(customer)
                 if products:
-                    st.markdown("## Recommended Products")
-                    for prod in products[:6]:
-                        st.markdown(f"""
-                            <div class="recommendation-card">
-                                <div class="recommendation-title">{prod['name']}</div>
-                                <p>{prod['description']}</p>
-                                <span class="recommendation-score">Match: {prod['similarity']}</span>
-                            </div>
-                        """, unsafe_allow_html=True)
-                    
-                    st.markdown('<div class="llm-recommendations">', unsafe_allow_html=True)
-                    st.markdown("### LLM-Powered Recommendations")
-                    st.markdown(get_llm_recommendations(customer, products))
-                    st.markdown('</div>', unsafe_allow_html=True)
+                    rendering.render_recommendations(products[:6], rationale)
+                    catalog = get_ad_catalog()
+                    matched_ads = catalog.match(products, customer["type"])
+                    if matched_ads:
+                        rendering.render_ads(
+                            [catalog.thumbnail_path(ad["id"], rendering.AD_WIDTH) for ad in matched_ads],
+                            [ad["title"] for ad in matched_ads],
+                        )
                 else:
                     st.warning("No matching products found")
-        st.markdown('</div></div>', unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
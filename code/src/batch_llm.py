@@ -0,0 +1,353 @@
+"""Batched LLM recommendations for bulk campaigns.
+
+get_llm_recommendations sends one free-text request per customer and repeats
+the instructions and every product description each time. Batch mode packs
+several compacted profiles and their candidate product ids into one JSON-mode
+request, describes each candidate product once per batch and parses the
+per-customer results back out.
+
+Batches are packed up to a token budget (prompt plus expected completion).
+The budget halves when a response is truncated or cannot be parsed and
+grows back after clean batches. Customers missing from a parsed response
+are retried one at a time. Transport errors (rate limits, timeouts, outages)
+are retried with exponential backoff instead; a batch that still fails is
+recorded as failed without per-customer retries, which would only add load.
+
+    python batch_llm.py run --out campaign.jsonl [--token-budget 6000]
+    python batch_llm.py report [--limit 25]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from app import (
+    PRODUCTS, RECOMMENDATION_PROMPT, VECTOR_STORE, format_search_results, get_all_customer_ids, get_chat_model,
+    get_customers, recommendation_inputs,
+)
+from segments import embed_customers
+
+TOP_N = 3
+TOKEN_BUDGET = 6000
+MIN_TOKEN_BUDGET = 1000
+MAX_BATCH_SIZE = 25
+# Completion tokens expected per customer: TOP_N recommendations with a one-sentence reason
+OUTPUT_TOKENS_PER_ITEM = 40 * TOP_N + 10
+BUDGET_GROWTH = 1.25
+# Client errors worth retrying; anything else (bad request, auth, bugs) propagates
+TRANSIENT_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+# Attempts per request on transient errors, waiting RETRY_DELAY * 2**attempt (plus jitter) in between
+MAX_ATTEMPTS = 4
+RETRY_DELAY = 1.0
+PRODUCTS_BY_ID = {p["id"]: p for p in PRODUCTS}
+
+INSTRUCTIONS = (
+    "You recommend bank products. For every customer below, pick up to {top_n} products from the "
+    "customer's \"candidates\" (ids from the catalog), with a one-sentence reason and a 1-10 match score.\n"
+    "Answer with JSON only, in this shape:\n"
+    '{{"results": [{{"customer_id": "...", "recommendations": [{{"product_id": 1, "reason": "...", "score": 8}}]}}]}}\n'
+)
+PROFILE_FIELDS = ("type", "age", "gender", "occupation", "education", "location", "income_per_year", "interests",
+                  "preferences", "industry", "financial_needs", "revenue_range", "employee_count_range")
+
+
+def estimate_tokens(text):
+    # About 4 characters per token for English with the GPT-4 family tokenizers
+    return len(text) // 4 + 1
+
+
+def compact_profile(customer):
+    """Non-empty profile fields, post intents and top spend categories instead of the raw rows"""
+    profile = {k: customer[k] for k in PROFILE_FIELDS if customer.get(k) not in (None, "")}
+    intents = sorted({post["intent"] for post in customer.get("social_media", []) if post.get("intent")})
+    if intents:
+        profile["intents"] = intents
+    spend = {}
+    for tx in customer.get("transactions", []):
+        category = tx.get("category") or "Other"
+        spend[category] = spend.get(category, 0) + (tx.get("amount_usd") or 0)
+    if spend:
+        profile["top_spend"] = sorted(spend, key=spend.get, reverse=True)[:3]
+    return profile
+
+
+def make_item(customer, products):
+    return {"customer_id": customer["customer_id"], "profile": compact_profile(customer),
+            "candidates": [p["id"] for p in products]}
+
+
+def item_line(item):
+    return json.dumps(item, separators=(",", ":"), ensure_ascii=False)
+
+
+def catalog_line(product_id):
+    product = PRODUCTS_BY_ID[product_id]
+    return f"{product_id}|{product['name']}|{product['description']}"
+
+
+def build_prompt(items, top_n=TOP_N):
+    product_ids = sorted({product_id for item in items for product_id in item["candidates"]})
+    return (
+        INSTRUCTIONS.format(top_n=top_n)
+        + "Catalog (id|name|description):\n" + "\n".join(catalog_line(p) for p in product_ids)
+        + "\nCustomers (one per line):\n" + "\n".join(item_line(item) for item in items)
+    )
+
+
+def strip_code_fence(content):
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[-1].rsplit("```", 1)[0]
+    return content
+
+
+def format_rationale(recommendations):
+    """Same "1. Name - Reason - Match Score" layout the single-customer prompt asks for"""
+    return "\n".join(f"{i}. {r['name']} - {r['reason']} - {r['score']}/10"
+                     for i, r in enumerate(recommendations, start=1))
+
+
+def candidate_products(customers):
+    """Vector search results for many customers, embedded in batches"""
+    vectors = embed_customers(customers)
+    return [format_search_results(VECTOR_STORE.similarity_search_with_score_by_vector(v.tolist(), k=10))
+            for v in vectors]
+
+
+def message_usage(prompt_text, message):
+    """(prompt, completion) tokens as reported by the API, or estimated when it reports none"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage["input_tokens"], usage["output_tokens"]
+    return estimate_tokens(prompt_text), estimate_tokens(str(message.content))
+
+
+class BatchRecommender:
+    def __init__(self, llm=None, token_budget=TOKEN_BUDGET, min_token_budget=MIN_TOKEN_BUDGET,
+                 max_batch_size=MAX_BATCH_SIZE, top_n=TOP_N, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        self.llm = llm or get_chat_model()
+        self.token_budget = token_budget
+        self.min_token_budget = min(min_token_budget, token_budget)
+        self.budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.top_n = top_n
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.requests = 0
+        self.batches = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retried = 0
+        self.transport_errors = 0
+        self.failed = []
+
+    def item_cost(self, item, known_products):
+        """Estimated tokens an item adds to a batch whose catalog already has known_products"""
+        new_products = set(item["candidates"]) - known_products
+        cost = (estimate_tokens(item_line(item)) + OUTPUT_TOKENS_PER_ITEM
+                + sum(estimate_tokens(catalog_line(p)) for p in new_products))
+        return cost, new_products
+
+    def pack(self, items):
+        """Greedy batches whose estimated prompt and completion tokens fit the current budget"""
+        base = estimate_tokens(build_prompt([], self.top_n))
+        batch, tokens, product_ids = [], base, set()
+        for item in items:
+            cost, new_products = self.item_cost(item, product_ids)
+            # self.budget is read per item, so it follows the results of batches already sent
+            if batch and (tokens + cost > self.budget or len(batch) >= self.max_batch_size):
+                yield batch
+                batch, tokens, product_ids = [], base, set()
+                cost, new_products = self.item_cost(item, product_ids)
+            batch.append(item)
+            tokens += cost
+            product_ids |= new_products
+        if batch:
+            yield batch
+
+    def request(self, items):
+        """One JSON-mode request; returns ({customer_id: recommendations}, complete).
+
+        Errors from the client propagate; send retries the transient ones.
+        """
+        prompt = build_prompt(items, self.top_n)
+        llm = self.llm.bind(response_format={"type": "json_object"},
+                            max_tokens=OUTPUT_TOKENS_PER_ITEM * len(items) * 2)
+        self.requests += 1
+        message = llm.invoke(prompt)
+        prompt_tokens, completion_tokens = message_usage(prompt, message)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        truncated = (getattr(message, "response_metadata", None) or {}).get("finish_reason") == "length"
+        try:
+            data = json.loads(strip_code_fence(str(message.content)))
+        except ValueError:
+            return {}, False
+        return self.parse(data, items), not truncated
+
+    def send(self, items):
+        """request() with exponential backoff on TRANSIENT_ERRORS; re-raises after max_attempts"""
+        for attempt in range(self.max_attempts):
+            try:
+                return self.request(items)
+            except TRANSIENT_ERRORS:
+                self.transport_errors += 1
+                if attempt + 1 >= self.max_attempts:
+                    raise
+                time.sleep(self.retry_delay * 2 ** attempt * (1 + random.random()))
+
+    def parse(self, data, items):
+        """Valid recommendations per requested customer; product ids must come from its candidates.
+
+        Entries of the wrong type are dropped rather than raised, so their customers
+        go to the individual retry instead of aborting the campaign.
+        """
+        candidates = {item["customer_id"]: set(item["candidates"]) for item in items}
+        results = {}
+        entries = data.get("results") if isinstance(data, dict) else None
+        for result in entries if isinstance(entries, list) else []:
+            customer_id = result.get("customer_id") if isinstance(result, dict) else None
+            if not isinstance(customer_id, str) or customer_id not in candidates:
+                continue
+            recs = result.get("recommendations")
+            recommendations = []
+            for rec in recs if isinstance(recs, list) else []:
+                product_id = rec.get("product_id") if isinstance(rec, dict) else None
+                # bool is an int subclass; True would otherwise match product 1
+                if (isinstance(product_id, int) and not isinstance(product_id, bool)
+                        and product_id in candidates[customer_id]):
+                    recommendations.append({
+                        "product_id": product_id,
+                        "name": PRODUCTS_BY_ID[product_id]["name"],
+                        "reason": str(rec.get("reason", "")),
+                        "score": rec.get("score"),
+                    })
+            if recommendations:
+                results[customer_id] = recommendations[:self.top_n]
+        return results
+
+    def recommend(self, items):
+        """{customer_id: recommendations} for every item that succeeded; the rest end up in self.failed"""
+        results = {}
+        for batch in self.pack(items):
+            self.batches += 1
+            try:
+                got, complete = self.send(batch)
+            except TRANSIENT_ERRORS:
+                self.failed.extend(item["customer_id"] for item in batch)
+                continue
+            if not complete:
+                self.budget = max(self.min_token_budget, self.budget // 2)
+            elif len(got) == len(batch):
+                self.budget = min(self.token_budget, int(self.budget * BUDGET_GROWTH))
+            results.update(got)
+            for item in batch:
+                if item["customer_id"] in got:
+                    continue
+                self.retried += 1
+                try:
+                    retry, _ = self.send([item])
+                except TRANSIENT_ERRORS:
+                    retry = {}
+                if item["customer_id"] in retry:
+                    results.update(retry)
+                else:
+                    self.failed.append(item["customer_id"])
+        return results
+
+    def stats(self, customers):
+        total = self.prompt_tokens + self.completion_tokens
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "retried": self.retried,
+            "transport_errors": self.transport_errors,
+            "failed": len(self.failed),
+            "final_token_budget": self.budget,
+            "requests_per_customer": round(self.requests / customers, 3) if customers else None,
+            "prompt_tokens_per_customer": round(self.prompt_tokens / customers, 1) if customers else None,
+            "completion_tokens_per_customer": round(self.completion_tokens / customers, 1) if customers else None,
+            "tokens_per_customer": round(total / customers, 1) if customers else None,
+        }
+
+
+def load_items(customer_ids=None):
+    """Batch items for customers with a profile and at least one candidate product"""
+    customers = [c for c in get_customers(customer_ids or get_all_customer_ids()) if c.get("type")]
+    pairs = [(c, products) for c, products in zip(customers, candidate_products(customers)) if products]
+    return pairs, [make_item(c, products) for c, products in pairs]
+
+
+def single_path_usage(pairs, llm=None):
+    """Requests and tokens of get_llm_recommendations' prompt, one request per customer"""
+    llm = llm or get_chat_model()
+    prompt_tokens = completion_tokens = 0
+    for customer, products in pairs:
+        prompt_value = RECOMMENDATION_PROMPT.invoke(recommendation_inputs(customer, products))
+        usage = message_usage(prompt_value.to_string(), llm.invoke(prompt_value))
+        prompt_tokens += usage[0]
+        completion_tokens += usage[1]
+    customers = len(pairs)
+    return {
+        "requests": customers,
+        "requests_per_customer": 1.0 if customers else None,
+        "prompt_tokens_per_customer": round(prompt_tokens / customers, 1) if customers else None,
+        "completion_tokens_per_customer": round(completion_tokens / customers, 1) if customers else None,
+        "tokens_per_customer": round((prompt_tokens + completion_tokens) / customers, 1) if customers else None,
+    }
+
+
+def compare(customer_ids=None, token_budget=TOKEN_BUDGET, llm=None):
+    """Requests and tokens per customer for the single-customer path against batch mode"""
+    pairs, items = load_items(customer_ids)
+    start = time.perf_counter()
+    single = single_path_usage(pairs, llm)
+    single["seconds"] = round(time.perf_counter() - start, 3)
+
+    recommender = BatchRecommender(llm, token_budget=token_budget)
+    start = time.perf_counter()
+    recommender.recommend(items)
+    batch = recommender.stats(len(items))
+    batch["seconds"] = round(time.perf_counter() - start, 3)
+
+    report = {"customers": len(items), "single": single, "batch": batch}
+    if single["tokens_per_customer"] and batch["tokens_per_customer"]:
+        report["token_reduction"] = round(1 - batch["tokens_per_customer"] / single["tokens_per_customer"], 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="batch recommendations for a campaign")
+    run.add_argument("--customer-ids", help="comma-separated ids; default all customers")
+    run.add_argument("--out", help="JSONL output file; default stdout")
+    run.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    run.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    report = commands.add_parser("report", help="compare requests and tokens per customer with the single path")
+    report.add_argument("--limit", type=int, help="only the first N customers")
+    report.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    if args.command == "report":
+        customer_ids = get_all_customer_ids()[:args.limit] if args.limit else None
+        print(json.dumps(compare(customer_ids, args.token_budget), indent=2))
+        return
+
+    _, items = load_items(args.customer_ids.split(",") if args.customer_ids else None)
+    recommender = BatchRecommender(token_budget=args.token_budget, max_batch_size=args.max_batch_size)
+    results = recommender.recommend(items)
+    out = open(args.out, "w") if args.out else sys.stdout
+    for customer_id, recommendations in results.items():
+        out.write(json.dumps({"customer_id": customer_id, "recommendations": recommendations,
+                              "rationale": format_rationale(recommendations)}) + "\n")
+    if args.out:
+        out.close()
+    print(json.dumps(recommender.stats(len(items)), indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
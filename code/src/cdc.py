@@ -0,0 +1,244 @@
+"""Event-driven refresh of precomputed recommendations.
+
+Triggers on the four customer tables append to customer_change_log (see
+init_change_log in app.py). This worker drains the log in batches: it
+re-embeds the affected customers' similarity queries in one call, searches
+the product index and stores the top products in precomputed_recommendations,
+which compute_recommendations serves instead of running the vector search.
+A customer with changes still queued is never served a stale row; the
+request falls back to the live search until the worker catches up.
+
+    python cdc.py run              # keep draining, with adaptive batch size
+    python cdc.py run --once       # drain what is queued now, then exit
+    python cdc.py status           # queue depth and lag
+    python cdc.py backfill         # enqueue every customer, e.g. after a product change
+
+With DB_PARTITIONS set, each partition file has its own change log; run and
+backfill cover every partition and status reports them separately.
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from app import DB_FILE, PARTITIONS, VECTOR_STORE, format_search_results, get_customer_details
+from change_queue import HIGH_WATERMARK, throttle
+from segments import embed_customers
+
+TOP_K = 10
+LAG_WINDOW = 1000
+# Customers queued per transaction by enqueue_all
+ENQUEUE_CHUNK = 1000
+
+
+def connect(db_file=DB_FILE):
+    # The worker and the app write the same file; wait for locks instead of failing
+    return sqlite3.connect(db_file, timeout=30.0)
+
+
+def queue_stats(conn):
+    """Queue depth, distinct customers waiting and the age of the oldest pending change"""
+    depth, customers, oldest = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT customer_id), MIN(changed_at) FROM customer_change_log"
+    ).fetchone()
+    return {
+        "depth": depth,
+        "customers_pending": customers,
+        "oldest_age_seconds": round(time.time() - oldest, 3) if oldest is not None else 0.0,
+    }
+
+
+def merge_queue_stats(stats):
+    """Combines queue_stats of several partitions"""
+    return {
+        "depth": sum(s["depth"] for s in stats),
+        "customers_pending": sum(s["customers_pending"] for s in stats),
+        "oldest_age_seconds": max((s["oldest_age_seconds"] for s in stats), default=0.0),
+    }
+
+
+def enqueue_all(conn, chunk_size=ENQUEUE_CHUNK, high_watermark=HIGH_WATERMARK):
+    """Queues a refresh for every customer in conn's file; returns the number queued.
+
+    Waits for the worker between chunks while the queue is above high_watermark.
+    """
+    queued, after = 0, ""
+    while True:
+        throttle(conn, high_watermark)
+        with conn:
+            customer_ids = [row[0] for row in conn.execute(
+                "SELECT customer_id FROM customer_index WHERE customer_id > ? ORDER BY customer_id LIMIT ?",
+                (after, chunk_size),
+            )]
+            conn.executemany("INSERT INTO customer_change_log (customer_id, table_name) VALUES (?, 'backfill')",
+                             [(c,) for c in customer_ids])
+        if not customer_ids:
+            return queued
+        queued += len(customer_ids)
+        after = customer_ids[-1]
+
+
+class RefreshWorker:
+    """Drains customer_change_log; the batch size adapts to keep each batch near target_batch_seconds"""
+
+    def __init__(self, db_file=DB_FILE, min_batch=16, max_batch=512, target_batch_seconds=1.0,
+                 idle_sleep=0.2, max_idle_sleep=5.0):
+        self.db_file = db_file
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.batch_size = min_batch
+        self.target_batch_seconds = target_batch_seconds
+        self.idle_sleep = idle_sleep
+        self.max_idle_sleep = max_idle_sleep
+        self.changes_processed = 0
+        self.customers_refreshed = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_batch_seconds = None
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def drain_batch(self, conn):
+        """Processes up to batch_size queued changes; returns how many were taken off the queue"""
+        start = time.perf_counter()
+        changes = conn.execute(
+            "SELECT change_id, customer_id, changed_at FROM customer_change_log ORDER BY change_id LIMIT ?",
+            (self.batch_size,),
+        ).fetchall()
+        if not changes:
+            return 0
+        last_change_id = changes[-1][0]
+        customer_ids = list(dict.fromkeys(c[1] for c in changes))
+
+        customers = [get_customer_details(c, conn) for c in customer_ids]
+        current = [c for c in customers if c.get("type")]
+        # get_customer_details leaves out the id when the profile row is gone
+        removed = [c for c, customer in zip(customer_ids, customers) if not customer.get("type")]
+        vectors = embed_customers(current) if current else np.empty((0, 0), dtype=np.float32)
+        now = time.time()
+        rows = []
+        for customer, vector in zip(current, vectors):
+            results = VECTOR_STORE.similarity_search_with_score_by_vector(vector.tolist(), k=TOP_K)
+            rows.append((customer["customer_id"], vector.tobytes(), json.dumps(format_search_results(results)),
+                         now, last_change_id))
+
+        # Ids are assigned in commit order, so everything up to the last id read is in
+        # this batch; changes that arrived meanwhile stay queued for the next one.
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO precomputed_recommendations VALUES (?, ?, ?, ?, ?)", rows)
+            conn.executemany("DELETE FROM precomputed_recommendations WHERE customer_id = ?", [(c,) for c in removed])
+            conn.execute("DELETE FROM customer_change_log WHERE change_id <= ?", (last_change_id,))
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.changes_processed += len(changes)
+            self.customers_refreshed += len(rows)
+            self.batches += 1
+            self.last_batch_seconds = elapsed
+            self._lags.extend(now - c[2] for c in changes)
+        self._adapt(len(changes), elapsed)
+        return len(changes)
+
+    def _adapt(self, taken, elapsed):
+        # Grow while full batches finish well under target (amortizes the embedding call),
+        # shrink when a batch overruns so the lock on the change log is held briefly
+        if elapsed > self.target_batch_seconds:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+        elif taken == self.batch_size and elapsed < self.target_batch_seconds / 2:
+            self.batch_size = min(self.max_batch, self.batch_size * 2)
+
+    def run(self, once=False):
+        """Drains until stopped (or until the queue is empty with once=True)"""
+        conn = connect(self.db_file)
+        sleep = self.idle_sleep
+        try:
+            while not self._stop.is_set():
+                try:
+                    taken = self.drain_batch(conn)
+                except Exception:
+                    # Changes stay queued and are retried after the backoff
+                    with self._lock:
+                        self.errors += 1
+                    if once:
+                        raise
+                    taken = 0
+                if taken:
+                    sleep = self.idle_sleep
+                    continue
+                if once:
+                    break
+                self._stop.wait(sleep)
+                sleep = min(self.max_idle_sleep, sleep * 2)
+        finally:
+            conn.close()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name="cdc-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            lags = np.asarray(self._lags) * 1000
+            return {
+                "changes_processed": self.changes_processed,
+                "customers_refreshed": self.customers_refreshed,
+                "batches": self.batches,
+                "errors": self.errors,
+                "batch_size": self.batch_size,
+                "last_batch_ms": round(self.last_batch_seconds * 1000, 1) if self.last_batch_seconds else None,
+                "lag_ms": {f"p{q}": round(float(np.percentile(lags, q)), 1) if len(lags) else None for q in (50, 95)},
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="drain the change log")
+    run.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    run.add_argument("--min-batch", type=int, default=16)
+    run.add_argument("--max-batch", type=int, default=512)
+    run.add_argument("--target-batch-seconds", type=float, default=1.0)
+    commands.add_parser("status", help="print queue depth and lag")
+    commands.add_parser("backfill", help="queue a refresh for every customer")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        # One worker per partition, each draining its own file
+        workers = {path: RefreshWorker(path, min_batch=args.min_batch, max_batch=args.max_batch,
+                                       target_batch_seconds=args.target_batch_seconds)
+                   for path in PARTITIONS.all_paths()}
+        threads = [threading.Thread(target=worker.run, kwargs={"once": args.once}, daemon=True)
+                   for worker in workers.values()]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            for worker in workers.values():
+                worker.stop()
+        print(json.dumps({path: worker.stats() for path, worker in workers.items()}, indent=2))
+        return
+
+    report = {}
+    for path in PARTITIONS.all_paths():
+        conn = connect(path)
+        report[path] = {"queued": enqueue_all(conn)} if args.command == "backfill" else queue_stats(conn)
+        conn.close()
+    if args.command == "status":
+        report["total"] = merge_queue_stats(list(report.values()))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Backpressure on customer_change_log for bulk writers.
+
+Every write to the customer tables queues a change (see init_change_log in
+app.py) that cdc.py drains. Bulk jobs (sentiment scoring, cdc backfill,
+partition rebalance) call throttle() between chunks so they cannot grow the
+queue faster than the worker drains it. No app imports, so the offline jobs
+can use it without loading the models.
+"""
+import time
+
+# Bulk writers block while more changes than this are queued
+HIGH_WATERMARK = 10000
+# How long a bulk writer waits for the worker before giving up
+THROTTLE_TIMEOUT = 300.0
+
+
+def wait_for_capacity(conn, high_watermark=HIGH_WATERMARK, timeout=30.0, poll_interval=0.1):
+    """Blocks a bulk writer until the queue is below the watermark; returns False on timeout"""
+    deadline = time.monotonic() + timeout
+    while conn.execute("SELECT COUNT(*) FROM customer_change_log").fetchone()[0] >= high_watermark:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+    return True
+
+
+def throttle(conn, high_watermark=HIGH_WATERMARK, timeout=THROTTLE_TIMEOUT):
+    """wait_for_capacity for bulk jobs; call outside a transaction so the worker can drain.
+
+    A no-op on files without a change log; raises TimeoutError if the queue does not drain.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customer_change_log'").fetchone() is None:
+        return
+    if not wait_for_capacity(conn, high_watermark, timeout):
+        raise TimeoutError(f"{high_watermark}+ changes still queued after {timeout:.0f}s; is `python cdc.py run` running?")
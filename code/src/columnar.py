@@ -0,0 +1,299 @@
+"""Columnar Parquet snapshot of the customer tables for analytics scans.
+
+Exports the four customer tables to Parquet datasets hash-partitioned by
+customer_id, and loads them back as Arrow tables or NumPy columns so feature
+building and aggregation run as column scans instead of sqlite3.Row -> dict.
+
+With DB_PARTITIONS set, every partition file is exported on its own thread
+into the same dataset, so the snapshot covers all customers.
+
+Each table directory holds versioned exports and a CURRENT file naming the
+live one. A refresh writes a new version and then replaces CURRENT in one
+atomic rename, so readers see either the old or the new table, never none.
+
+    python columnar.py export [--db customer_data_expanded.db] [--out snapshot]
+    python columnar.py bench [--rows 1000000]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import zlib
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from partitions import PartitionMap
+
+DB_FILE = os.getenv("DB_FILE", "customer_data_expanded.db")
+DB_PARTITIONS = os.getenv("DB_PARTITIONS", "")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshot")
+SNAPSHOT_TABLES = ["customer_profile_ind", "customer_profile_org", "social_media_sentiment", "transaction_history"]
+PARTITION_BUCKETS = 16
+EXPORT_BATCH_ROWS = 65536
+
+SQLITE_TO_ARROW = {"TEXT": pa.string(), "INTEGER": pa.int64(), "REAL": pa.float64()}
+PARTITION_SCHEMA = pa.schema([("bucket", pa.int32())])
+CURRENT_FILE = "CURRENT"
+# Empty file carrying the table schema, so empty tables still load with their columns;
+# the leading underscore keeps dataset discovery from reading it as data
+SCHEMA_FILE = "_schema.parquet"
+
+
+def table_schema(conn, table):
+    columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    if not columns:
+        raise ValueError(f"No table {table!r} in the database; with DB_PARTITIONS set the customer tables "
+                         "live in the partition files, not DB_FILE")
+    return pa.schema([(name, SQLITE_TO_ARROW.get(decl.upper(), pa.string())) for _, name, decl, *_ in columns])
+
+
+def bucket_for(customer_id, buckets=PARTITION_BUCKETS):
+    return zlib.crc32(customer_id.encode()) % buckets
+
+
+def customer_buckets(customer_ids, buckets=PARTITION_BUCKETS):
+    """Stable hash bucket per id; each distinct id is hashed once"""
+    encoded = pc.dictionary_encode(customer_ids)
+    bucket_of = np.array([bucket_for(v, buckets) for v in encoded.dictionary.to_pylist()], dtype=np.int32)
+    return pa.array(bucket_of[encoded.indices.to_numpy(zero_copy_only=False)])
+
+
+def table_batches(conn, table, schema, buckets):
+    cursor = conn.execute(f"SELECT {', '.join(schema.names)} FROM {table}")
+    while rows := cursor.fetchmany(EXPORT_BATCH_ROWS):
+        columns = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+        columns.append(customer_buckets(columns[schema.get_field_index("customer_id")], buckets))
+        yield pa.RecordBatch.from_arrays(columns, schema=schema.append(pa.field("bucket", pa.int32())))
+
+
+def current_version(table_dir):
+    """Directory of the live export; snapshots written before CURRENT existed are the table dir itself"""
+    try:
+        with open(os.path.join(table_dir, CURRENT_FILE)) as f:
+            return os.path.join(table_dir, f.read().strip())
+    except FileNotFoundError:
+        return table_dir
+
+
+def publish(table_dir, version):
+    """Points CURRENT at version atomically, then drops all but it and the previous version,
+    which readers that opened the table before the swap may still be scanning"""
+    previous = current_version(table_dir)
+    pointer = os.path.join(table_dir, CURRENT_FILE + ".tmp")
+    with open(pointer, "w") as f:
+        f.write(os.path.basename(version))
+    os.replace(pointer, os.path.join(table_dir, CURRENT_FILE))
+    for name in os.listdir(table_dir):
+        path = os.path.join(table_dir, name)
+        if os.path.isdir(path) and path not in (version, previous):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def export_file(db_file, table, version, buckets, part):
+    """Writes one file's rows of table into the version directory; returns the row count"""
+    # write_dataset pulls batches from its own thread; only one thread reads at a time
+    conn = sqlite3.connect(db_file, check_same_thread=False)
+    rows = 0
+    try:
+        schema = table_schema(conn, table)
+
+        def counted(batches):
+            nonlocal rows
+            for batch in batches:
+                rows += batch.num_rows
+                yield batch
+
+        ds.write_dataset(
+            counted(table_batches(conn, table, schema, buckets)), version, format="parquet",
+            schema=schema.append(pa.field("bucket", pa.int32())),
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+            # One name prefix per source file, so parallel writers never replace each other's files
+            basename_template=f"part-{part}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    finally:
+        conn.close()
+    return rows
+
+
+def export_snapshot(db_file=DB_FILE, out_dir=SNAPSHOT_DIR, buckets=PARTITION_BUCKETS, partition_map=None):
+    """Rewrites the snapshot; each table is published only after it is fully written.
+
+    partition_map (default: db_file alone) lists the files to export; they are
+    read in parallel and merged into one dataset per table.
+    """
+    partition_map = partition_map or PartitionMap(db_file)
+    paths = partition_map.all_paths()
+    counts = {}
+    for table in SNAPSHOT_TABLES:
+        conn = sqlite3.connect(paths[0])
+        try:
+            full_schema = table_schema(conn, table).append(pa.field("bucket", pa.int32()))
+        finally:
+            conn.close()
+        table_dir = os.path.join(out_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        # Versions sort by creation time
+        version = tempfile.mkdtemp(prefix=f"v{time.time_ns()}-", dir=table_dir)
+        try:
+            rows = partition_map.fan_out(lambda path: export_file(path, table, version, buckets, paths.index(path)))
+            pq.write_table(full_schema.empty_table(), os.path.join(version, SCHEMA_FILE))
+        except BaseException:
+            shutil.rmtree(version, ignore_errors=True)
+            raise
+        publish(table_dir, version)
+        counts[table] = sum(rows.values())
+    return counts
+
+
+def customer_filter(customer_ids, buckets=PARTITION_BUCKETS):
+    """Filter for load_table on one id or a list of ids.
+
+    The hive partitions are keyed by bucket, so a customer_id predicate alone
+    scans every file; the added bucket predicate lets the dataset skip the
+    partitions that cannot hold the ids. buckets must match the export.
+    """
+    if isinstance(customer_ids, str):
+        customer_ids = [customer_ids]
+    bucket_ids = sorted({bucket_for(c, buckets) for c in customer_ids})
+    return pc.field("bucket").isin(bucket_ids) & pc.field("customer_id").isin(customer_ids)
+
+
+def load_table(table, columns=None, filter=None, snapshot_dir=SNAPSHOT_DIR):
+    """Arrow table for one snapshot table; only filters on bucket prune partitions (see customer_filter)"""
+    path = current_version(os.path.join(snapshot_dir, table))
+    schema_path = os.path.join(path, SCHEMA_FILE)
+    schema = pq.read_schema(schema_path) if os.path.exists(schema_path) else None
+    dataset = ds.dataset(path, format="parquet", partitioning="hive", schema=schema)
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def to_numpy_columns(table, columns=None):
+    """NumPy arrays per column, one per Arrow chunk; numeric chunks without nulls are zero-copy views.
+
+    Joining the chunks (np.concatenate) is left to the caller since it copies.
+    """
+    arrays = {}
+    for name in columns or table.column_names:
+        column = table.column(name)
+        numeric = pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+        arrays[name] = [chunk.to_numpy(zero_copy_only=numeric and chunk.null_count == 0) for chunk in column.chunks]
+    return arrays
+
+
+def customer_features(snapshot_dir=SNAPSHOT_DIR):
+    """Per-customer spend and sentiment features computed as grouped column scans"""
+    spend = load_table("transaction_history", ["customer_id", "amount_usd"], snapshot_dir=snapshot_dir).group_by(
+        "customer_id").aggregate([("amount_usd", "sum"), ("amount_usd", "count"), ("amount_usd", "max")])
+    sentiment = load_table("social_media_sentiment", ["customer_id", "sentiment_score"], snapshot_dir=snapshot_dir).group_by(
+        "customer_id").aggregate([("sentiment_score", "mean"), ("sentiment_score", "count")])
+    return spend.join(sentiment, "customer_id", join_type="full outer")
+
+
+def empty_features():
+    return {"amount_usd_sum": 0, "amount_usd_count": 0, "amount_usd_max": None,
+            "sentiment_score_sum": 0.0, "sentiment_score_count": 0}
+
+
+def sqlite_row_features(db_file=DB_FILE):
+    """Same features via the sqlite3.Row -> dict path used by get_customer_details"""
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    features = {}
+    for row in conn.execute("SELECT * FROM transaction_history"):
+        tx = dict(row)
+        f = features.setdefault(tx["customer_id"], empty_features())
+        f["amount_usd_sum"] += tx["amount_usd"] or 0
+        f["amount_usd_count"] += 1
+        f["amount_usd_max"] = max(f["amount_usd_max"] or 0, tx["amount_usd"] or 0)
+    for row in conn.execute("SELECT * FROM social_media_sentiment"):
+        post = dict(row)
+        f = features.setdefault(post["customer_id"], empty_features())
+        if post["sentiment_score"] is not None:
+            f["sentiment_score_sum"] += post["sentiment_score"]
+            f["sentiment_score_count"] += 1
+    conn.close()
+    return features
+
+
+def make_benchmark_db(source_db, rows):
+    """Copy of source_db with transaction_history and social posts replicated to about `rows` rows"""
+    path = os.path.join(tempfile.mkdtemp(), "columnar_bench.db")
+    src = sqlite3.connect(source_db)
+    dst = sqlite3.connect(path)
+    src.backup(dst)
+    src.close()
+    for table, key in (("transaction_history", "product_id"), ("social_media_sentiment", "post_id")):
+        base = dst.execute(f"SELECT * FROM {table}").fetchall()
+        names = [c[1] for c in dst.execute(f"PRAGMA table_info({table})")]
+        key_index = names.index(key)
+        copies = max(rows // max(len(base), 1), 1)
+        with dst:
+            dst.execute(f"DELETE FROM {table}")
+            for copy in range(copies):
+                batch = []
+                for row in base:
+                    row = list(row)
+                    row[0] = f"{row[0]}_{copy % 50000}"
+                    row[key_index] = f"{row[key_index]}-{copy}" if isinstance(row[key_index], str) else row[key_index] * 100000 + copy
+                    batch.append(row)
+                dst.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({', '.join('?' * len(names))})", batch)
+    dst.close()
+    return path
+
+
+def benchmark(rows=1000000, db_file=DB_FILE):
+    bench_db = make_benchmark_db(db_file, rows)
+    snapshot_dir = os.path.join(os.path.dirname(bench_db), "snapshot")
+    try:
+        start = time.perf_counter()
+        counts = export_snapshot(bench_db, snapshot_dir)
+        export_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        row_features = sqlite_row_features(bench_db)
+        sqlite_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        arrow_features = customer_features(snapshot_dir)
+        arrow_seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(os.path.dirname(bench_db), ignore_errors=True)
+
+    return {
+        "rows": counts,
+        "customers": {"sqlite_rows": len(row_features), "arrow": arrow_features.num_rows},
+        "export_seconds": round(export_seconds, 3),
+        "sqlite_row_path_seconds": round(sqlite_seconds, 3),
+        "arrow_column_path_seconds": round(arrow_seconds, 3),
+        "speedup": round(sqlite_seconds / arrow_seconds, 1) if arrow_seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_FILE)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write or refresh the Parquet snapshot")
+    export.add_argument("--out", default=SNAPSHOT_DIR)
+    export.add_argument("--buckets", type=int, default=PARTITION_BUCKETS)
+    bench = commands.add_parser("bench", help="compare the Arrow scan with the SQLite row path")
+    bench.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        result = export_snapshot(args.db, args.out, args.buckets, PartitionMap(args.db, DB_PARTITIONS))
+    else:
+        result = benchmark(args.rows, args.db)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Bounded pools of SQLite connections shared by worker threads."""
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    def __init__(self, db_file, size=8, timeout=30.0, read_only=True):
+        self.db_file = db_file
+        self.read_only = read_only
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._idle.put(self._connect())
+
+    def _connect(self):
+        # Connections move between executor threads, so disable the owner check;
+        # the pool guarantees only one thread uses a connection at a time.
+        conn = sqlite3.connect(self.db_file, check_same_thread=False, timeout=self.timeout)
+        if self.read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def connection_for(self, customer_id):
+        # One file holds every customer
+        return self.connection()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class PartitionedPool:
+    """One ConnectionPool per partition file; connection_for picks the customer's file"""
+
+    def __init__(self, partition_map, size=8, timeout=30.0, read_only=True):
+        self.partition_map = partition_map
+        self.pools = {path: ConnectionPool(path, size, timeout, read_only) for path in partition_map.all_paths()}
+
+    def connection_for(self, customer_id):
+        return self.pools[self.partition_map.path_for(customer_id)].connection()
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
@@ -0,0 +1,182 @@
+"""Concurrent-session load test for the recommendation pipeline.
+
+Simulates N sessions of one Streamlit worker process: each session loads a
+customer picker page, selects a customer and runs the "Generate
+Recommendations" pipeline through app.get_recommendations, so precomputed
+products and single-flight sharing behave as in the app. Database, search and
+LLM times come from the pipeline's profiling.stage markers. Unless --base-url
+or --backend stub is given, the embedding and chat calls go over HTTP to an
+in-process mock_openai server.
+
+    python loadtest.py --levels 1,2,4,8,16 --requests-per-session 10 --chat-latency-ms 800
+    python loadtest.py --levels 1,8 --fail-p95-ms 3000 --fail-error-rate 0.01   # CI gate
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import profiling
+
+# Report column -> profiling.stage markers it sums
+STAGE_MARKERS = {
+    "db": ("search_customer_ids", "get_customer_details"),
+    "search": ("vector_search",),
+    "llm": ("get_llm_recommendations",),
+}
+STAGES = tuple(STAGE_MARKERS)
+# A stage whose median latency grows by more than this factor across the ramp is reported as saturating
+SATURATION_SLOWDOWN = 1.5
+
+
+def run_session(app, customer_ids, requests, rng):
+    """One simulated user; mirrors main() without the Streamlit rendering"""
+    samples = []
+    for _ in range(requests):
+        customer_id = rng.choice(customer_ids)
+        products, error = [], None
+        start = time.perf_counter()
+        with profiling.time_stages() as markers:
+            try:
+                with profiling.stage("search_customer_ids"):
+                    app.search_customer_ids(customer_id[:4], limit=app.PICKER_PAGE_SIZE + 1)
+                _, products, _ = app.get_recommendations(customer_id)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        # Requests that joined another session's flight only record the picker stage
+        stages = {
+            stage: sum(markers[m] for m in names if m in markers)
+            for stage, names in STAGE_MARKERS.items() if any(m in markers for m in names)
+        }
+        samples.append({"latency": time.perf_counter() - start, "stages": stages, "error": error,
+                        "empty": error is None and not products})
+    return samples
+
+
+def percentiles_ms(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ms = np.asarray(values) * 1000
+    return {f"p{q}": round(float(np.percentile(ms, q)), 1) for q in (50, 95, 99)}
+
+
+def run_level(app, concurrency, requests_per_session, customer_ids, seed=0):
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as executor:
+        start = time.perf_counter()
+        sessions = [
+            executor.submit(run_session, app, customer_ids, requests_per_session, random.Random(seed + i))
+            for i in range(concurrency)
+        ]
+        samples = [s for session in sessions for s in session.result()]
+        wall = time.perf_counter() - start
+
+    ok = [s for s in samples if s["error"] is None]
+    errors = [s["error"] for s in samples if s["error"] is not None]
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+        # vector_search reports failures in the UI and returns no products, so they land here
+        "empty_results": sum(s["empty"] for s in samples),
+        "empty_rate": round(sum(s["empty"] for s in samples) / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / wall, 2) if wall else 0.0,
+        "latency_ms": percentiles_ms([s["latency"] for s in ok]),
+        "stage_ms": {stage: percentiles_ms([s["stages"][stage] for s in ok if stage in s["stages"]]) for stage in STAGES},
+        "sample_errors": sorted(set(errors))[:3],
+    }
+
+
+def run_ramp(app, levels, requests_per_session, customer_ids, seed=0):
+    results = [run_level(app, level, requests_per_session, customer_ids, seed) for level in levels]
+    # How much each stage's median grew from the lowest to the highest concurrency level;
+    # the stage with the largest growth is where the worker saturates first.
+    first, last = results[0]["stage_ms"], results[-1]["stage_ms"]
+    slowdown = {
+        stage: round(last[stage]["p50"] / first[stage]["p50"], 2)
+        for stage in STAGES if first[stage]["p50"] and last[stage]["p50"]
+    }
+    worst = max(slowdown, key=slowdown.get) if slowdown else None
+    return {
+        "levels": results,
+        "stage_slowdown": slowdown,
+        "saturating_stage": worst if worst and slowdown[worst] > SATURATION_SLOWDOWN else None,
+    }
+
+
+def print_table(report):
+    print(f"{'conc':>5} {'req':>6} {'err%':>6} {'empty%':>7} {'rps':>8} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9}  "
+          + "  ".join(f"{stage + ' p95':>11}" for stage in STAGES))
+    for level in report["levels"]:
+        latency = level["latency_ms"]
+        print(f"{level['concurrency']:>5} {level['requests']:>6} {100 * level['error_rate']:>6.1f} "
+              f"{100 * level['empty_rate']:>7.1f} "
+              f"{level['throughput_rps']:>8.2f} {latency['p50'] or 0:>9.1f} {latency['p95'] or 0:>9.1f} "
+              f"{latency['p99'] or 0:>9.1f}  "
+              + "  ".join(f"{level['stage_ms'][stage]['p95'] or 0:>11.1f}" for stage in STAGES))
+    print(f"stage slowdown (p50, last/first level): {report['stage_slowdown']}; "
+          f"saturating stage: {report['saturating_stage']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated session counts")
+    parser.add_argument("--requests-per-session", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["mock", "stub"], default="mock",
+                        help="mock: HTTP to mock_openai; stub: in-process offline models")
+    parser.add_argument("--base-url", help="use an existing OpenAI-compatible server instead of the mock")
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=500.0)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--fail-p95-ms", type=float, help="exit 1 if any level's p95 latency exceeds this")
+    parser.add_argument("--fail-error-rate", type=float, help="exit 1 if any level's error rate exceeds this")
+    parser.add_argument("--fail-empty-rate", type=float, default=0.0,
+                        help="exit 1 if any level's share of requests without products exceeds this; search and "
+                             "embedding failures only show up here (default 0, 1 disables)")
+    args = parser.parse_args()
+
+    # app reads its backend configuration at import time, so set it up first
+    if args.backend == "stub":
+        os.environ["RECOMMENDER_BACKEND"] = "stub"
+    elif args.base_url:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+    else:
+        from mock_openai import MockSettings, start_in_thread
+        settings = MockSettings(args.embedding_latency_ms, args.chat_latency_ms,
+                                error_rate=args.mock_error_rate, seed=args.seed)
+        _, base_url = start_in_thread(settings)
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+    import app
+
+    levels = [int(level) for level in args.levels.split(",")]
+    report = run_ramp(app, levels, args.requests_per_session, app.get_all_customer_ids(), args.seed)
+    print_table(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    for level in report["levels"]:
+        p95 = level["latency_ms"]["p95"]
+        if args.fail_p95_ms is not None and (p95 is None or p95 > args.fail_p95_ms):
+            failures.append(f"concurrency {level['concurrency']}: p95 {p95} ms > {args.fail_p95_ms} ms")
+        if args.fail_error_rate is not None and level["error_rate"] > args.fail_error_rate:
+            failures.append(f"concurrency {level['concurrency']}: error rate {level['error_rate']} > {args.fail_error_rate}")
+        if level["empty_rate"] > args.fail_empty_rate:
+            failures.append(f"concurrency {level['concurrency']}: empty result rate {level['empty_rate']} "
+                            f"> {args.fail_empty_rate}")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
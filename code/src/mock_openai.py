@@ -0,0 +1,127 @@
+"""OpenAI-compatible mock server with configurable latency and failure rate.
+
+Serves /v1/embeddings and /v1/chat/completions using the offline models from
+stub_backends.py, so the app can be exercised over real HTTP without an API key.
+
+    python mock_openai.py --port 8001 --embedding-latency-ms 80 --chat-latency-ms 1500
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=mock streamlit run app.py
+"""
+import argparse
+import asyncio
+import base64
+import random
+import threading
+import time
+import uuid
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from stub_backends import StubEmbeddings, is_json_mode, stub_batch_recommendations, stub_recommendation_text, tokenize
+
+
+class MockSettings:
+    def __init__(self, embedding_latency_ms=50.0, chat_latency_ms=500.0, jitter=0.2, error_rate=0.0, seed=None):
+        self.embedding_latency_ms = embedding_latency_ms
+        self.chat_latency_ms = chat_latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+
+async def simulate(settings, latency_ms):
+    """Sleeps for the configured latency (+/- jitter); returns an error response or None"""
+    delay = latency_ms * (1 + settings.jitter * (2 * settings.random.random() - 1)) / 1000
+    await asyncio.sleep(max(delay, 0))
+    if settings.random.random() < settings.error_rate:
+        return JSONResponse({"error": {"message": "Injected failure", "type": "server_error"}}, status_code=500)
+    return None
+
+
+def usage(texts):
+    tokens = sum(len(tokenize(t)) for t in texts)
+    return {"prompt_tokens": tokens, "total_tokens": tokens}
+
+
+def create_app(settings=None):
+    settings = settings or MockSettings()
+    embeddings = StubEmbeddings()
+
+    async def create_embeddings(request):
+        body = await request.json()
+        if error := await simulate(settings, settings.embedding_latency_ms):
+            return error
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        texts = [t if isinstance(t, str) else " ".join(map(str, t)) for t in inputs]
+        data = []
+        for i, vector in enumerate(embeddings.embed_documents(texts)):
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        return JSONResponse({"object": "list", "data": data, "model": body.get("model", "mock"), "usage": usage(texts)})
+
+    async def create_chat_completion(request):
+        body = await request.json()
+        if error := await simulate(settings, settings.chat_latency_ms):
+            return error
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        if is_json_mode(body.get("response_format")):
+            content = stub_batch_recommendations(prompt)
+        else:
+            content = stub_recommendation_text(prompt)
+        prompt_usage = usage([prompt])
+        completion_tokens = len(tokenize(content))
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_usage["prompt_tokens"],
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_usage["prompt_tokens"] + completion_tokens,
+            },
+        })
+
+    return Starlette(routes=[
+        Route("/v1/embeddings", create_embeddings, methods=["POST"]),
+        Route("/v1/chat/completions", create_chat_completion, methods=["POST"]),
+    ])
+
+
+def start_in_thread(settings=None, host="127.0.0.1", port=0):
+    """Runs the mock in a daemon thread; returns (server, base_url) once it is accepting requests"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_app(settings), host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="mock-openai", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Mock OpenAI server failed to start")
+        time.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://{host}:{bound_port}/v1"
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=500.0)
+    parser.add_argument("--jitter", type=float, default=0.2, help="relative latency jitter, 0.2 = +/-20%%")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    settings = MockSettings(args.embedding_latency_ms, args.chat_latency_ms, args.jitter, args.error_rate)
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
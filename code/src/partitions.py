@@ -0,0 +1,205 @@
+"""Partitioning of customer data across SQLite files.
+
+DB_PARTITIONS picks how customer ids map to files next to DB_FILE:
+
+    (unset)         everything in DB_FILE
+    hash:4          crc32 of the id modulo 4 -> <db>.h0.db ... <db>.h3.db
+    region:US,IN    region code of ids like ORG_US_004 -> <db>.US.db, <db>.IN.db,
+                    ids without a listed region -> <db>.other.db
+
+Each partition file holds the four customer tables with their own id index,
+change log and precomputed recommendations; DB_FILE keeps the shared segment
+tables. Point lookups open the one file that owns the id, listings and batch
+reads fan out to the files on a thread pool and merge the results.
+
+After changing DB_PARTITIONS, move existing rows to their new files:
+
+    DB_PARTITIONS=hash:4 python partitions.py rebalance [--dry-run]
+    DB_PARTITIONS=hash:4 python partitions.py status
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from change_queue import HIGH_WATERMARK, throttle
+
+CUSTOMER_TABLES = ("customer_profile_ind", "customer_profile_org", "social_media_sentiment", "transaction_history")
+# Region code in ids such as ORG_US_004
+REGION_PATTERN = re.compile(r"^[A-Z]+_([A-Z]{2})_")
+OTHER_REGION = "other"
+# Customers moved per transaction by rebalance
+REBALANCE_CHUNK = 1000
+
+
+def region_of(customer_id):
+    match = REGION_PATTERN.match(customer_id)
+    return match.group(1) if match else None
+
+
+class PartitionMap:
+    def __init__(self, db_file, spec=""):
+        self.db_file = db_file
+        self.spec = spec or ""
+        kind, _, arg = self.spec.partition(":")
+        if not self.spec:
+            names, self._key = [None], lambda customer_id: None
+        elif kind == "hash":
+            count = int(arg or 0)
+            if count < 1:
+                raise ValueError(f"hash partitioning needs a positive count, got {self.spec!r}")
+            names = [f"h{i}" for i in range(count)]
+            self._key = lambda customer_id: names[zlib.crc32(customer_id.encode()) % count]
+        elif kind == "region":
+            regions = [r.strip().upper() for r in arg.split(",") if r.strip()]
+            if not regions:
+                raise ValueError(f"region partitioning needs a list of regions, got {self.spec!r}")
+            names = regions + [OTHER_REGION]
+            self._key = lambda customer_id: region if (region := region_of(customer_id)) in regions else OTHER_REGION
+        else:
+            raise ValueError(f"Unknown partition spec {self.spec!r}; expected hash:<n> or region:<codes>")
+        self.kind = kind if self.spec else None
+        self.paths = {name: self.path(name) for name in names}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def partitioned(self):
+        return self.kind is not None
+
+    def path(self, name):
+        if name is None:
+            return self.db_file
+        stem, ext = os.path.splitext(self.db_file)
+        return f"{stem}.{name}{ext or '.db'}"
+
+    def all_paths(self):
+        return list(self.paths.values())
+
+    def path_for(self, customer_id):
+        return self.paths[self._key(customer_id)]
+
+    def paths_for_prefix(self, prefix):
+        """Files that can hold ids starting with prefix; region partitioning prunes on the region code"""
+        if self.kind == "region" and region_of(prefix) is not None:
+            return [self.path_for(prefix)]
+        return self.all_paths()
+
+    def group(self, customer_ids):
+        """{path: ids owned by that file}, keeping the input order within each file"""
+        groups = {}
+        for customer_id in customer_ids:
+            groups.setdefault(self.path_for(customer_id), []).append(customer_id)
+        return groups
+
+    def fan_out(self, func, paths=None):
+        """{path: func(path)}, run in parallel threads when there is more than one path"""
+        paths = self.all_paths() if paths is None else list(paths)
+        if len(paths) <= 1:
+            return {path: func(path) for path in paths}
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=len(self.paths), thread_name_prefix="partition")
+        futures = {path: self._executor.submit(func, path) for path in paths}
+        return {path: future.result() for path, future in futures.items()}
+
+
+def existing_files(db_file):
+    """DB_FILE and every partition file next to it, whatever spec created them"""
+    stem, ext = os.path.splitext(db_file)
+    return [db_file] + sorted(p for p in glob.glob(f"{glob.escape(stem)}.*{ext or '.db'}") if p != db_file)
+
+
+def table_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def rebalance(partition_map, dry_run=False, chunk_size=REBALANCE_CHUNK, high_watermark=HIGH_WATERMARK):
+    """Moves every customer whose rows are not in the file partition_map assigns them to.
+
+    Customers move in chunks, each chunk's rows in all four tables in one
+    transaction; the triggers update the id indexes and queue the customers for
+    a cdc refresh in the target, so each chunk first waits until the target's
+    change log is below high_watermark. The moved customers' changes queued in
+    the source are dropped with them. Sources outside the current spec (e.g.
+    DB_FILE when first partitioning) have no worker draining them and are not
+    throttled. Returns {"source -> target": customers moved}.
+    """
+    moved = {}
+    active = set(partition_map.all_paths())
+    for source in existing_files(partition_map.db_file):
+        conn = sqlite3.connect(source, timeout=30.0)
+        source_tables = table_names(conn)
+        tables = [t for t in CUSTOMER_TABLES if t in source_tables]
+        customer_ids = sorted({
+            row[0] for table in tables for row in conn.execute(f"SELECT DISTINCT customer_id FROM {table}")
+        })
+        for target, ids in partition_map.group(customer_ids).items():
+            if target == source:
+                continue
+            moved[f"{source} -> {target}"] = len(ids)
+            if dry_run:
+                continue
+            target_conn = sqlite3.connect(target, timeout=30.0)
+            conn.execute("ATTACH DATABASE ? AS target", (target,))
+            try:
+                for start in range(0, len(ids), chunk_size):
+                    if source in active:
+                        throttle(conn, high_watermark)
+                    throttle(target_conn, high_watermark)
+                    ids_json = json.dumps(ids[start:start + chunk_size])
+                    with conn:
+                        for table in tables:
+                            conn.execute(f"INSERT OR REPLACE INTO target.{table} SELECT * FROM main.{table} "
+                                         "WHERE customer_id IN (SELECT value FROM json_each(?))", (ids_json,))
+                            conn.execute(f"DELETE FROM main.{table} "
+                                         "WHERE customer_id IN (SELECT value FROM json_each(?))", (ids_json,))
+                        for table in ("precomputed_recommendations", "customer_change_log"):
+                            if table in source_tables:
+                                conn.execute(f"DELETE FROM main.{table} "
+                                             "WHERE customer_id IN (SELECT value FROM json_each(?))", (ids_json,))
+            finally:
+                conn.execute("DETACH DATABASE target")
+                target_conn.close()
+        conn.close()
+    return moved
+
+
+def status(partition_map):
+    report = {}
+    for path in existing_files(partition_map.db_file):
+        conn = sqlite3.connect(path)
+        customers = 0
+        if "customer_index" in table_names(conn):
+            customers = conn.execute("SELECT COUNT(*) FROM customer_index").fetchone()[0]
+        conn.close()
+        report[path] = {"customers": customers, "bytes": os.path.getsize(path),
+                        "in_current_spec": path in partition_map.paths.values()}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebalance_parser = commands.add_parser("rebalance", help="move rows to the files DB_PARTITIONS assigns them to")
+    rebalance_parser.add_argument("--dry-run", action="store_true", help="only report what would move")
+    commands.add_parser("status", help="customers and size per file")
+    args = parser.parse_args()
+
+    # Importing app creates the partition files and their schema for the current spec
+    import app
+
+    if args.command == "rebalance":
+        report = {"moved": rebalance(app.PARTITIONS, args.dry_run), "dry_run": args.dry_run}
+    else:
+        report = status(app.PARTITIONS)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Opt-in profiling of a single recommendation run.
+
+Enabled for every run with RECOMMENDER_PROFILE=1. With
+RECOMMENDER_PROFILE_QUERY=1 the hidden ?profile=1 query parameter profiles
+single runs; it is ignored otherwise, so page visitors cannot write profiles.
+A profiled run writes three files to RECOMMENDER_PROFILE_DIR (default
+"profiles"), named <timestamp>_<customer_id>; only the newest
+RECOMMENDER_PROFILE_MAX_RUNS runs (default 50) are kept:
+
+  .collapsed  sampled stacks in collapsed format (flamegraph.pl, speedscope),
+              each rooted at the pipeline stage it was sampled in
+  .txt        stage timings and the top-N functions by cumulative time
+  .pstats     raw cProfile data for snakeviz / pstats
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+PROFILE_ENABLED = os.getenv("RECOMMENDER_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_QUERY_ENABLED = os.getenv("RECOMMENDER_PROFILE_QUERY", "").lower() in ("1", "true", "yes")
+PROFILE_MAX_RUNS = int(os.getenv("RECOMMENDER_PROFILE_MAX_RUNS", "50"))
+PROFILE_DIR = os.getenv("RECOMMENDER_PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = float(os.getenv("RECOMMENDER_PROFILE_INTERVAL", "0.005"))
+TOP_N = 30
+
+_active = threading.local()
+# cProfile cannot always run in several threads at once (sys.monitoring on 3.12+),
+# so concurrent profiled runs fall back to sampling only.
+_cprofile_lock = threading.Lock()
+
+
+def profile_requested(query_value=None):
+    """Whether to profile this run; query_value is the ?profile= parameter, honored only when allowed"""
+    return PROFILE_ENABLED or (PROFILE_QUERY_ENABLED and query_value == "1")
+
+
+def prune_runs(out_dir, max_runs=PROFILE_MAX_RUNS):
+    """Deletes the files of all but the newest max_runs runs; names start with the run's timestamp"""
+    runs = {}
+    for name in os.listdir(out_dir):
+        runs.setdefault(os.path.splitext(name)[0], []).append(name)
+    for base in sorted(runs)[:max(len(runs) - max_runs, 0)]:
+        for name in runs[base]:
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except OSError:
+                pass
+
+
+class ProfileRun:
+    def __init__(self, customer_id, out_dir=PROFILE_DIR, interval=SAMPLE_INTERVAL, root_depth=0):
+        self.customer_id = customer_id
+        self.out_dir = out_dir
+        self.interval = interval
+        # Number of frames above the profiled block's caller; sampled stacks start at the caller
+        self.root_depth = root_depth
+        self.thread_id = threading.get_ident()
+        self.current_stage = "other"
+        self.stages = []
+        self.samples = Counter()
+        self.paths = {}
+        self._start = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[";".join([f"stage:{self.current_stage}"] + stack[self.root_depth:])] += 1
+
+    @contextmanager
+    def stage(self, name):
+        previous, self.current_stage = self.current_stage, name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, start - self._start, time.perf_counter() - self._start))
+            self.current_stage = previous
+
+    def write(self, profiler, total):
+        os.makedirs(self.out_dir, exist_ok=True)
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", str(self.customer_id))
+        base = os.path.join(self.out_dir, f"{datetime.now():%Y%m%d-%H%M%S-%f}_{safe_id}")
+
+        self.paths["collapsed"] = base + ".collapsed"
+        with open(self.paths["collapsed"], "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        report = io.StringIO()
+        report.write(f"customer_id: {self.customer_id}\n")
+        report.write(f"total: {total * 1000:.1f} ms, samples: {sum(self.samples.values())}\n\n")
+        report.write(f"{'stage':<28} {'start ms':>10} {'end ms':>10} {'duration ms':>12}\n")
+        for name, start, end in self.stages:
+            report.write(f"{name:<28} {start * 1000:>10.1f} {end * 1000:>10.1f} {(end - start) * 1000:>12.1f}\n")
+        report.write("\n")
+        if profiler is not None:
+            self.paths["pstats"] = base + ".pstats"
+            profiler.dump_stats(self.paths["pstats"])
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(TOP_N)
+        else:
+            report.write("cProfile skipped: another profiled run was active\n")
+
+        self.paths["report"] = base + ".txt"
+        with open(self.paths["report"], "w") as f:
+            f.write(report.getvalue())
+        prune_runs(self.out_dir)
+
+
+@contextmanager
+def profile_run(customer_id, out_dir=PROFILE_DIR, interval=SAMPLE_INTERVAL):
+    """Profiles the enclosed block on the calling thread; yields the ProfileRun"""
+    # Skip this generator and contextmanager.__enter__ to reach the caller's frame
+    frame, depth = sys._getframe(2), 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    run = ProfileRun(customer_id, out_dir, interval, root_depth=depth - 1)
+
+    profiler = cProfile.Profile() if _cprofile_lock.acquire(blocking=False) else None
+    sampler = threading.Thread(target=run._sample, name="profile-sampler", daemon=True)
+    previous, _active.run = getattr(_active, "run", None), run
+    run._start = time.perf_counter()
+    sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield run
+    finally:
+        run._stop.set()
+        total = time.perf_counter() - run._start
+        if profiler is not None:
+            profiler.disable()
+            _cprofile_lock.release()
+        sampler.join()
+        _active.run = previous
+        run.write(profiler, total)
+
+
+class StageTimer:
+    """Collects stage() durations without sampling or cProfile, e.g. for load tests"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def time_stages():
+    """Times the stage() markers hit by the enclosed block on this thread; yields {stage: seconds}"""
+    timer = StageTimer()
+    previous, _active.run = getattr(_active, "run", None), timer
+    try:
+        yield timer.stages
+    finally:
+        _active.run = previous
+
+
+def stage(name):
+    """Marks a pipeline stage in the active profiled run on this thread; no-op otherwise"""
+    run = getattr(_active, "run", None)
+    return run.stage(name) if run is not None else nullcontext()
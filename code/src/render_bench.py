@@ -0,0 +1,142 @@
+"""Counts Streamlit deltas and measures server-side render time of the page.
+
+Runs main() for each customer with "Generate Recommendations" pressed, against
+a recording stand-in for the streamlit module and with the recommendation
+pipeline precomputed, so only page building is measured. Pass --baseline with
+an older app.py to compare before and after:
+
+    git show <rev>:code/src/app.py > app_before.py
+    RECOMMENDER_BACKEND=stub python render_bench.py --baseline app_before.py
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+os.environ.setdefault("RECOMMENDER_BACKEND", "stub")
+
+# Calls that do not send anything to the browser
+NON_DELTA_CALLS = {"set_page_config", "rerun"}
+
+
+class _SessionState(dict):
+    __getattr__ = dict.get
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+class RecordingStreamlit:
+    """Minimal streamlit stand-in that counts element deltas"""
+
+    def __init__(self, customer_id):
+        self.customer_id = customer_id
+        self.deltas = 0
+        self.session_state = _SessionState()
+        self.query_params = {}
+
+    def _delta(self, count=1):
+        self.deltas += count
+
+    @contextmanager
+    def _block(self, *args, **kwargs):
+        self._delta()
+        yield self
+
+    container = expander = spinner = _block
+
+    # Columns are returned as the recorder itself and used as context managers
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def columns(self, spec, **kwargs):
+        n = spec if isinstance(spec, int) else len(spec)
+        self._delta(n + 1)
+        return [self] * n
+
+    def button(self, label, key=None, **kwargs):
+        self._delta()
+        return key == "generate_button"
+
+    def selectbox(self, label, options, **kwargs):
+        self._delta()
+        return self.customer_id
+
+    def text_input(self, *args, **kwargs):
+        self._delta()
+        return ""
+
+    def toggle(self, *args, **kwargs):
+        self._delta()
+        return False
+
+    def __getattr__(self, name):
+        def element(*args, **kwargs):
+            if name not in NON_DELTA_CALLS:
+                self._delta()
+        return element
+
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(module, results, repeats):
+    """Mean deltas and render time of main() per customer, with the pipeline stubbed out"""
+    real_st = module.st
+    real_get = module.get_recommendations
+    module.get_recommendations = lambda customer_id, *args, **kwargs: results[customer_id]
+    deltas, first_ms, warm_ms = [], [], []
+    try:
+        for customer_id in results:
+            timings = []
+            for _ in range(repeats):
+                recorder = RecordingStreamlit(customer_id)
+                module.st = recorder
+                # Modules that render through rendering.py use its streamlit reference too
+                if hasattr(module, "rendering"):
+                    module.rendering.st = recorder
+                start = time.perf_counter()
+                module.main()
+                timings.append((time.perf_counter() - start) * 1000)
+            deltas.append(recorder.deltas)
+            first_ms.append(timings[0])
+            warm_ms.append(statistics.median(timings[1:]) if repeats > 1 else timings[0])
+    finally:
+        module.st = real_st
+        if hasattr(module, "rendering"):
+            module.rendering.st = real_st
+        module.get_recommendations = real_get
+    return {
+        "mean_deltas": round(statistics.mean(deltas), 1),
+        "max_deltas": max(deltas),
+        "first_render_ms": round(statistics.mean(first_ms), 3),
+        "repeat_render_ms": round(statistics.mean(warm_ms), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="path to an older app.py to compare against")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    import app
+    results = {customer_id: app.compute_recommendations(customer_id) for customer_id in app.get_all_customer_ids()}
+    report = {"customers": len(results), "current": measure(app, results, args.repeats)}
+    if args.baseline:
+        report["baseline"] = measure(load_module(args.baseline, "app_baseline"), results, args.repeats)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
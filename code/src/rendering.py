@@ -0,0 +1,211 @@
+"""HTML rendering for the profile and recommendation sections of the page.
+
+Each section is built as one HTML fragment from precompiled templates and sent
+with a single st.markdown call instead of one call per field. Fragments are
+memoized by customer id and a hash of the customer's data, so reruns for the
+same customer skip the string building and a write to one customer only
+invalidates that customer's fragments. All interpolated values are HTML-escaped.
+"""
+import hashlib
+import html
+import json
+import threading
+from collections import OrderedDict
+from string import Template
+
+import streamlit as st
+
+# One stylesheet for the whole page. Streamlit drops elements that a rerun does
+# not emit again, so this is sent once per run (a single delta) rather than
+# once per section.
+PAGE_CSS = """<style>
+.profile-card { background: #ffffff; border-radius: 10px; padding: 20px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); margin-bottom: 20px; }
+.section-title { color: #1a73e8; font-size: 24px; margin-bottom: 15px; border-bottom: 2px solid #1a73e8; padding-bottom: 5px; }
+.info-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px; }
+.info-item { background: #f8f9fa; padding: 10px; border-radius: 5px; }
+.social-post { background: #f1f8ff; padding: 15px; border-radius: 8px; margin: 10px 0; border-left: 4px solid #1a73e8; }
+.stat-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px; margin: 15px 0; }
+.stat-label { font-size: 14px; color: #5f6368; }
+.stat-value { font-size: 32px; }
+.recommendation-card { background: #ffffff; border-radius: 10px; padding: 15px; margin: 10px 0; box-shadow: 0 2px 5px rgba(0,0,0,0.1); transition: transform 0.2s; }
+.recommendation-card:hover { transform: translateY(-5px); }
+.recommendation-title { color: #2e7d32; font-size: 20px; margin-bottom: 8px; }
+.recommendation-score { background: #e8f5e9; padding: 5px 10px; border-radius: 15px; font-size: 12px; color: #2e7d32; }
+</style>"""
+
+# Templates avoid blank lines and leading indentation: either would end the
+# HTML block in Streamlit's markdown renderer.
+INFO_ITEM = Template('<div class="info-item"><b>$label:</b> $value</div>')
+STAT = Template('<div><div class="stat-label">$label</div><div class="stat-value">$value</div></div>')
+PROFILE_CARD = Template(
+    '<div class="profile-card"><h2 class="section-title">$title</h2>\n'
+    '<div class="info-grid">$items</div>\n'
+    '$stats'
+    '$details'
+    '</div>'
+)
+SOCIAL_POST = Template(
+    '<div class="social-post">'
+    '<b>$platform | $timestamp</b><br>'
+    '<i>$content</i><br>'
+    '<small style="color:$color">Sentiment: $sentiment</small> | '
+    '<small>Intent: $intent</small>'
+    '</div>'
+)
+RECOMMENDATION_CARD = Template(
+    '<div class="recommendation-card">'
+    '<div class="recommendation-title">$name</div>'
+    '<p>$description</p>'
+    '<span class="recommendation-score">Match: $similarity</span>'
+    '</div>'
+)
+
+# Display width of ad thumbnails; ads.py serves them from the smallest size bucket that fits
+AD_WIDTH = 320
+
+INDIVIDUAL_FIELDS = [("ID", "customer_id", ""), ("Age", "age", " years"), ("Gender", "gender", ""),
+                     ("Location", "location", ""), ("Occupation", "occupation", ""), ("Education", "education", "")]
+ORGANIZATION_FIELDS = [("ID", "customer_id", ""), ("Industry", "industry", ""),
+                       ("Revenue", "revenue_range", ""), ("Employees", "employee_count_range", "")]
+
+
+def esc(value):
+    return html.escape(str(value))
+
+
+def info_items(customer, fields):
+    return "".join(INFO_ITEM.substitute(label=label, value=esc(customer.get(key, "N/A")) + suffix)
+                   for label, key, suffix in fields)
+
+
+def details(customer, fields):
+    return "".join(f'<p><b>{label}:</b> {esc(customer.get(key, "N/A"))}</p>' for label, key in fields)
+
+
+def profile_fragment(customer):
+    if customer.get("type") == "individual":
+        return PROFILE_CARD.substitute(
+            title="👤 Individual Profile",
+            items=info_items(customer, INDIVIDUAL_FIELDS),
+            stats='<div class="stat-grid">' + STAT.substitute(
+                label="Annual Income", value=f"${customer.get('income_per_year') or 0:,}") + "</div>",
+            details=details(customer, [("Interests", "interests"), ("Preferences", "preferences")]),
+        )
+    if customer.get("type") == "organization":
+        return PROFILE_CARD.substitute(
+            title="🏢 Organization Profile",
+            items=info_items(customer, ORGANIZATION_FIELDS),
+            stats="",
+            details=details(customer, [("Financial Needs", "financial_needs"), ("Preferences", "preferences")]),
+        )
+    return ""
+
+
+def social_fragment(customer):
+    posts = customer.get("social_media")
+    if not posts:
+        return ""
+    rendered = "".join(SOCIAL_POST.substitute(
+        platform=esc(post.get("platform", "Platform")),
+        timestamp=esc(post.get("timestamp", "Date")),
+        content=esc(post.get("content", "No content")),
+        color="#2ecc71" if float(post.get("sentiment_score") or 0) > 0 else "#e74c3c",
+        sentiment=esc(post.get("sentiment_score", "N/A")),
+        intent=esc(post.get("intent", "N/A")),
+    ) for post in posts[:3])
+    return f'<div class="profile-card"><h2 class="section-title">💬 Social Media Insights</h2>\n{rendered}</div>'
+
+
+def transactions_fragment(customer):
+    transactions = customer.get("transactions")
+    if not transactions:
+        return ""
+    total_spend = sum(tx.get("amount_usd") or 0 for tx in transactions)
+    categories = {}
+    for tx in transactions:
+        cat = tx.get("category", "Other")
+        categories[cat] = categories.get(cat, 0) + (tx.get("amount_usd") or 0)
+    top = "".join(f"<li><b>{esc(cat)}</b>: ${amount:,}</li>"
+                  for cat, amount in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:3])
+    return (
+        '<div class="profile-card"><h2 class="section-title">💳 Transaction Summary</h2>\n'
+        '<div class="stat-grid">'
+        + STAT.substitute(label="Total Transactions", value=len(transactions))
+        + STAT.substitute(label="Total Spend", value=f"${total_spend:,}")
+        + f'<div><div class="stat-label">Top Categories</div><ul>{top}</ul></div>'
+        '</div></div>'
+    )
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered fragments.
+
+    A plain dict lookup rather than st.cache_data, whose argument hashing and
+    result pickling cost more than building the fragments.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+FRAGMENTS = FragmentCache()
+
+
+def customer_version(customer):
+    """Hash of the customer's rows as read; the fragments key is derived from the very
+    data being rendered, so a concurrent write cannot file old data under a new version"""
+    encoded = json.dumps(customer, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def customer_fragments(customer):
+    """Profile, social and transaction fragments, memoized by customer id and customer_version"""
+    return FRAGMENTS.get(
+        ("customer", customer.get("customer_id"), customer_version(customer)),
+        lambda: (profile_fragment(customer), social_fragment(customer), transactions_fragment(customer)),
+    )
+
+
+def recommendations_fragment(products):
+    # Cards only depend on the product (fixed name and description) and its match score
+    return FRAGMENTS.get(
+        ("cards",) + tuple((p["id"], p["similarity"]) for p in products),
+        lambda: "\n".join(RECOMMENDATION_CARD.substitute(
+            name=esc(p["name"]), description=esc(p["description"]), similarity=esc(p["similarity"]),
+        ) for p in products),
+    )
+
+
+def inject_css():
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
+
+
+def render_customer_profile(customer):
+    for fragment in customer_fragments(customer):
+        if fragment:
+            st.markdown(fragment, unsafe_allow_html=True)
+
+
+def render_recommendations(products, rationale):
+    st.markdown("## Recommended Products\n" + recommendations_fragment(products), unsafe_allow_html=True)
+    st.markdown(f"### LLM-Powered Recommendations\n\n{rationale or ''}")
+
+
+def render_ads(paths, captions):
+    # One st.image call for all ads; the files are small pre-resized thumbnails
+    st.markdown("## Offers for You")
+    st.image(paths, caption=captions, width=AD_WIDTH)
@@ -0,0 +1,178 @@
+"""Offline customer segmentation for the app's fast mode.
+
+Clusters customer query embeddings with k-means, then precomputes ranked
+products and an LLM rationale once per segment instead of once per customer.
+
+    python segments.py build --clusters 8
+    python segments.py report [--with-llm]
+"""
+import argparse
+import json
+import sqlite3
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import faiss
+import numpy as np
+
+from app import (
+    DB_FILE, EMBEDDING_MODEL, VECTOR_STORE, compute_recommendations, format_search_results,
+    generate_similarity_query, get_all_customer_ids, get_customers, get_llm_recommendations,
+    get_segment_recommendations,
+)
+
+EMBED_BATCH_SIZE = 64
+# Lower bounds of the income bands shown to the LLM instead of exact incomes
+INCOME_BANDS = ((200000, "$200k+"), (100000, "$100k-$200k"), (50000, "$50k-$100k"), (0, "under $50k"))
+SUMMARY_TOP_INTERESTS = 3
+
+
+def embed_customers(customers):
+    queries = [generate_similarity_query(c) for c in customers]
+    vectors = []
+    for start in range(0, len(queries), EMBED_BATCH_SIZE):
+        vectors.extend(EMBEDDING_MODEL.embed_documents(queries[start:start + EMBED_BATCH_SIZE]))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def income_band(income):
+    return next(label for floor, label in INCOME_BANDS if income >= floor)
+
+
+def most_common(values):
+    counts = Counter(v for v in values if v)
+    return counts.most_common(1)[0][0] if counts else None
+
+
+def segment_summary(members):
+    """De-identified description of a segment for the LLM prompt: only the most
+    common occupation, income band and interests (industry and revenue range for
+    organizations), never ids or another member's personal fields"""
+    interests = Counter(
+        interest.strip() for c in members for interest in (c.get("interests") or "").split(",") if interest.strip()
+    )
+    summary = {
+        "type": most_common(c.get("type") for c in members) or "unknown",
+        "segment_size": len(members),
+        "occupation": most_common(c.get("occupation") for c in members),
+        "income_band": most_common(
+            income_band(c["income_per_year"]) for c in members if c.get("income_per_year") is not None
+        ),
+        "interests": ", ".join(i for i, _ in interests.most_common(SUMMARY_TOP_INTERESTS)) or None,
+        "industry": most_common(c.get("industry") for c in members),
+        "revenue_range": most_common(c.get("revenue_range") for c in members),
+    }
+    return {k: v for k, v in summary.items() if v is not None}
+
+
+def build_segments(n_clusters=8, niter=25, seed=1234, with_rationale=True):
+    """Cluster all customers and replace the stored segments; returns a build summary"""
+    customer_ids = get_all_customer_ids()
+    if not customer_ids:
+        raise ValueError("No customers to cluster")
+    customers = get_customers(customer_ids)
+    embeddings = embed_customers(customers)
+
+    n_clusters = min(n_clusters, len(customer_ids))
+    kmeans = faiss.Kmeans(embeddings.shape[1], n_clusters, niter=niter, seed=seed)
+    kmeans.train(embeddings)
+    distances, labels = kmeans.index.search(embeddings, 1)
+    distances, labels = distances[:, 0], labels[:, 0]
+
+    built_at = datetime.now(timezone.utc).isoformat()
+    segment_rows = []
+    for segment_id, centroid in enumerate(kmeans.centroids):
+        members = np.flatnonzero(labels == segment_id)
+        if not len(members):
+            continue
+        # The member closest to the centroid is recorded for reports; the prompt only sees the summary
+        prototype = members[np.argmin(distances[members])]
+        products = format_search_results(
+            VECTOR_STORE.similarity_search_with_score_by_vector(centroid.tolist(), k=10)
+        )
+        rationale = None
+        if with_rationale and products:
+            rationale = get_llm_recommendations(segment_summary([customers[i] for i in members]), products)
+        segment_rows.append((
+            segment_id, centroid.astype(np.float32).tobytes(), len(members),
+            customer_ids[prototype], json.dumps(products), rationale, built_at,
+        ))
+
+    conn = sqlite3.connect(DB_FILE)
+    with conn:
+        conn.execute("DELETE FROM customer_segment")
+        conn.execute("DELETE FROM customer_segment_member")
+        conn.executemany("INSERT INTO customer_segment VALUES (?, ?, ?, ?, ?, ?, ?)", segment_rows)
+        conn.executemany(
+            "INSERT INTO customer_segment_member VALUES (?, ?, ?)",
+            [(c, int(label), float(d)) for c, label, d in zip(customer_ids, labels, distances)],
+        )
+    conn.close()
+    return {
+        "customers": len(customer_ids),
+        "segments": len(segment_rows),
+        "inertia": float(distances.sum()),
+        "built_at": built_at,
+    }
+
+
+def latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {"mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95))}
+
+
+def compare_with_per_customer(with_llm=False):
+    """Quality drift and latency of fast mode against the live per-customer pipeline"""
+    overlaps, top1_matches = [], 0
+    full_times, fast_times = [], []
+    customer_ids = get_all_customer_ids()
+    for customer_id in customer_ids:
+        start = time.perf_counter()
+        # Skip rows precomputed by cdc.py so the embedding and search are actually timed
+        _, full_products, _ = compute_recommendations(customer_id, include_rationale=with_llm, use_precomputed=False)
+        full_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        result = get_segment_recommendations(customer_id)
+        fast_times.append(time.perf_counter() - start)
+        if result is None:
+            raise RuntimeError("No segments built; run `python segments.py build` first")
+
+        full_ids = [p["id"] for p in full_products]
+        fast_ids = [p["id"] for p in result[1]]
+        if full_ids:
+            overlaps.append(len(set(full_ids) & set(fast_ids)) / len(full_ids))
+        top1_matches += bool(full_ids and fast_ids and full_ids[0] == fast_ids[0])
+
+    return {
+        "customers": len(customer_ids),
+        "mean_product_overlap": float(np.mean(overlaps)) if overlaps else 0.0,
+        "top1_agreement": top1_matches / len(customer_ids) if customer_ids else 0.0,
+        "per_customer": latency_summary(full_times),
+        "fast_mode": latency_summary(fast_times),
+        "per_customer_includes_llm": with_llm,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="cluster customers and precompute segment recommendations")
+    build.add_argument("--clusters", type=int, default=8)
+    build.add_argument("--niter", type=int, default=25)
+    build.add_argument("--seed", type=int, default=1234)
+    build.add_argument("--no-rationale", action="store_true", help="skip the per-segment LLM call")
+    report = commands.add_parser("report", help="compare fast mode with the per-customer pipeline")
+    report.add_argument("--with-llm", action="store_true", help="include the gpt-4o call in per-customer latency")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        summary = build_segments(args.clusters, args.niter, args.seed, with_rationale=not args.no_rationale)
+    else:
+        summary = compare_with_per_customer(with_llm=args.with_llm)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
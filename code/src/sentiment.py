@@ -0,0 +1,185 @@
+"""Local sentiment and intent scoring for social_media_sentiment posts.
+
+Scores every post whose sentiment_score is NULL using a built-in lexicon, in
+vectorized NumPy chunks, with no network calls. Results are written back one
+transaction per chunk, so the job can be re-run incrementally at ingest time.
+The job waits between chunks while the change log is above its high
+watermark. With DB_PARTITIONS set, every partition file is scored on its own
+thread; --db scores a single file instead.
+
+    python sentiment.py [--db customer_data_expanded.db] [--chunk-size 5000]
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+
+import numpy as np
+
+from change_queue import HIGH_WATERMARK, throttle
+from partitions import PartitionMap, table_names
+
+DB_FILE = os.getenv("DB_FILE", "customer_data_expanded.db")
+DB_PARTITIONS = os.getenv("DB_PARTITIONS", "")
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+DEFAULT_INTENT = "General Engagement"
+
+SENTIMENT_LEXICON = {
+    # positive
+    "love": 2.0, "loving": 2.0, "excited": 2.0, "exciting": 2.0, "inspiring": 2.0, "delight": 2.0,
+    "beautiful": 1.5, "great": 1.5, "best": 1.0, "happy": 1.5, "promoted": 1.5, "launching": 1.0,
+    "new": 0.5, "growth": 1.0, "opportunity": 1.0, "thanks": 1.0, "awesome": 2.0, "amazing": 2.0,
+    "good": 1.0, "win": 1.5, "success": 1.5, "saving": 1.0, "savings": 0.5, "efficient": 1.0,
+    "open": 0.5, "future": 0.5, "tuned": 0.5, "join": 0.5, "easy": 1.0, "reward": 1.0, "rewards": 1.0,
+    # negative
+    "struggling": -2.0, "struggle": -2.0, "expensive": -1.5, "costly": -1.5, "hidden": -1.0,
+    "fees": -1.0, "fee": -1.0, "charge": -1.0, "complaint": -1.5, "bad": -1.5, "worst": -2.0,
+    "hate": -2.0, "rising": -0.5, "volatility": -1.0, "fluctuations": -1.0, "impacting": -0.5,
+    "debt": -1.0, "late": -1.0, "declined": -1.5, "fraud": -2.0, "scam": -2.0, "problem": -1.0,
+    "issue": -1.0, "slow": -1.0, "switching": -0.5, "delay": -1.0, "worried": -1.5, "concern": -1.0,
+}
+NEGATORS = {"not", "no", "never", "don't", "didn't", "isn't", "can't", "won't", "without"}
+
+INTENT_KEYWORDS = {
+    "Budget Concern": {"budget", "afford", "expensive", "struggling", "bills", "debt"},
+    "Bank Fee Complaint": {"fee", "fees", "charge", "charges", "hidden", "overdraft"},
+    "Financial Management Concern": {"cash", "flow", "liquidity", "prices", "planning", "fluctuations"},
+    "Subscription Change": {"membership", "subscription", "cancel", "switching", "renewal"},
+    "Wealth Management": {"wealth", "invest", "retirement", "portfolio", "promoted", "savings"},
+    "Investment Interest": {"investing", "investment", "startup", "stocks", "funds", "crypto"},
+    "Travel Interest": {"trip", "travel", "flight", "flights", "vacation", "europe", "tips"},
+    "Luxury Travel Interest": {"resort", "luxury", "stay", "suite"},
+    "Fitness Interest": {"fitness", "gym", "run", "running", "tracker", "workout"},
+    "Fashion Interest": {"shoes", "fashion", "clothing", "beauty", "apparel", "fabrics"},
+    "Gaming Interest": {"gaming", "streaming", "game", "games", "setup"},
+    "Art Interest": {"art", "gallery", "museum", "culture"},
+    "Tech Innovation Interest": {"ai", "blockchain", "tech", "platform", "integrate", "solutions"},
+    "Sustainability Interest": {"solar", "electric", "carbon", "green", "sustainable", "neutrality"},
+    "Digital Health Interest": {"telemedicine", "health", "healthcare", "medical"},
+    "Sponsorship Concern": {"sponsoring", "sponsorship", "athletes", "sponsor"},
+    "Audience Engagement": {"campaign", "collaborations", "celeb", "followers", "guess"},
+}
+INTENT_LABELS = list(INTENT_KEYWORDS) + [DEFAULT_INTENT]
+
+
+def build_vocabulary():
+    # Index 0 is reserved for out-of-vocabulary tokens and carries no weight
+    words = sorted(set(SENTIMENT_LEXICON) | NEGATORS | set().union(*INTENT_KEYWORDS.values()))
+    vocabulary = {word: i for i, word in enumerate(words, start=1)}
+    size = len(words) + 1
+
+    weights = np.zeros(size, dtype=np.float32)
+    negator = np.zeros(size, dtype=bool)
+    intent_hits = np.zeros((size, len(INTENT_KEYWORDS)), dtype=np.float32)
+    for word, index in vocabulary.items():
+        weights[index] = SENTIMENT_LEXICON.get(word, 0.0)
+        negator[index] = word in NEGATORS
+    for column, keywords in enumerate(INTENT_KEYWORDS.values()):
+        for word in keywords:
+            intent_hits[vocabulary[word], column] = 1.0
+    return vocabulary, weights, negator, intent_hits
+
+
+VOCABULARY, WEIGHTS, NEGATOR, INTENT_HITS = build_vocabulary()
+
+
+def score_posts(texts):
+    """Returns (sentiment scores in [-1, 1], intent labels) for a chunk of post texts"""
+    token_ids, post_index = [], []
+    for i, text in enumerate(texts):
+        ids = [VOCABULARY.get(token, 0) for token in TOKEN_PATTERN.findall((text or "").lower())]
+        token_ids.extend(ids)
+        post_index.extend([i] * len(ids))
+    n_posts = len(texts)
+    if not token_ids:
+        return np.zeros(n_posts, dtype=np.float32), [DEFAULT_INTENT] * n_posts
+
+    token_ids = np.asarray(token_ids, dtype=np.int64)
+    post_index = np.asarray(post_index, dtype=np.int64)
+
+    # A negator flips the polarity of the following token within the same post
+    weights = WEIGHTS[token_ids].copy()
+    negated = np.zeros(len(token_ids), dtype=bool)
+    negated[1:] = NEGATOR[token_ids[:-1]] & (post_index[1:] == post_index[:-1])
+    weights[negated] *= -1
+
+    sums = np.bincount(post_index, weights=weights, minlength=n_posts)
+    hits = np.bincount(post_index, weights=(WEIGHTS[token_ids] != 0), minlength=n_posts)
+    scores = np.round(np.tanh(sums / np.sqrt(np.maximum(hits, 1))), 2).astype(np.float32)
+
+    intent_counts = np.zeros((n_posts, INTENT_HITS.shape[1]), dtype=np.float32)
+    np.add.at(intent_counts, post_index, INTENT_HITS[token_ids])
+    best = intent_counts.argmax(axis=1)
+    best[intent_counts.max(axis=1) == 0] = len(INTENT_LABELS) - 1
+    return scores, [INTENT_LABELS[i] for i in best]
+
+
+def score_unscored_posts(conn, chunk_size=5000, high_watermark=HIGH_WATERMARK):
+    """Scores posts with a NULL sentiment_score until none are left; returns throughput stats"""
+    if "social_media_sentiment" not in table_names(conn):
+        raise ValueError("No social_media_sentiment table in the database; with DB_PARTITIONS set the "
+                         "customer tables live in the partition files, not DB_FILE")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sentiment_unscored ON social_media_sentiment (customer_id) "
+        "WHERE sentiment_score IS NULL"
+    )
+    scored = 0
+    start = time.perf_counter()
+    while True:
+        throttle(conn, high_watermark)
+        rows = conn.execute(
+            "SELECT rowid, content FROM social_media_sentiment WHERE sentiment_score IS NULL LIMIT ?",
+            (chunk_size,),
+        ).fetchall()
+        if not rows:
+            break
+        scores, intents = score_posts([row[1] for row in rows])
+        with conn:
+            conn.executemany(
+                "UPDATE social_media_sentiment SET sentiment_score = ?, intent = COALESCE(intent, ?) WHERE rowid = ?",
+                [(float(s), intent, row[0]) for s, intent, row in zip(scores, intents, rows)],
+            )
+        scored += len(rows)
+    seconds = time.perf_counter() - start
+    return {
+        "scored": scored,
+        "seconds": round(seconds, 3),
+        "posts_per_second": round(scored / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+
+def score_partitions(partition_map, chunk_size=5000, high_watermark=HIGH_WATERMARK):
+    """score_unscored_posts on every file of partition_map in parallel; returns totals and per-file stats"""
+    def score_file(path):
+        conn = sqlite3.connect(path, timeout=30.0)
+        try:
+            return score_unscored_posts(conn, chunk_size, high_watermark)
+        finally:
+            conn.close()
+
+    start = time.perf_counter()
+    per_file = partition_map.fan_out(score_file)
+    seconds = time.perf_counter() - start
+    scored = sum(stats["scored"] for stats in per_file.values())
+    return {
+        "scored": scored,
+        "seconds": round(seconds, 3),
+        "posts_per_second": round(scored / seconds, 1) if seconds > 0 else 0.0,
+        "files": per_file,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="score only this file; default DB_FILE or its DB_PARTITIONS files")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    partition_map = PartitionMap(args.db) if args.db else PartitionMap(DB_FILE, DB_PARTITIONS)
+    print(json.dumps(score_partitions(partition_map, args.chunk_size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Async HTTP API over the recommendation pipeline used by the Streamlit page.
+
+Run locally with the offline models:
+    RECOMMENDER_BACKEND=stub uvicorn service:app --port 8000
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app import PARTITIONS, RECOMMENDATION_FLIGHTS, RECOMMENDER_BACKEND, get_recommendations, get_segment_recommendations
+from cdc import merge_queue_stats, queue_stats
+from db_pool import PartitionedPool
+
+WORKER_THREADS = int(os.getenv("SERVICE_WORKER_THREADS", "8"))
+DB_POOL_SIZE = int(os.getenv("SERVICE_DB_POOL_SIZE", str(WORKER_THREADS)))
+MAX_BATCH_SIZE = int(os.getenv("SERVICE_MAX_BATCH_SIZE", "50"))
+
+
+def recommend(pool, customer_id, include_rationale=True, fast=False):
+    """Blocking pipeline for one customer; returns None for unknown ids"""
+    result = get_segment_recommendations(customer_id) if fast else None
+    if result is None:
+        result = get_recommendations(customer_id, include_rationale, pool)
+    customer, products, rationale = result
+    if not customer.get("type"):
+        return None
+    return {
+        "customer_id": customer_id,
+        "type": customer["type"],
+        "products": products,
+        "rationale": rationale if include_rationale else None,
+    }
+
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off")
+
+
+def parse_flag(value, default=True):
+    """Query-string boolean; raises ValueError for anything but the listed spellings"""
+    if value is None:
+        return default
+    if value.lower() in TRUE_VALUES:
+        return True
+    if value.lower() in FALSE_VALUES:
+        return False
+    raise ValueError(value)
+
+
+async def run_blocking(request, func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app.state.executor, partial(func, *args))
+
+
+async def health(request):
+    return JSONResponse({"status": "ok", "backend": RECOMMENDER_BACKEND})
+
+
+def change_queue_stats(pool):
+    stats = []
+    for partition_pool in pool.pools.values():
+        with partition_pool.connection() as conn:
+            stats.append(queue_stats(conn))
+    return merge_queue_stats(stats)
+
+
+async def metrics(request):
+    return JSONResponse({
+        "recommendation_flights": RECOMMENDATION_FLIGHTS.stats(),
+        "change_queue": await run_blocking(request, change_queue_stats, request.app.state.pool),
+    })
+
+
+async def customer_recommendations(request):
+    customer_id = request.path_params["customer_id"]
+    try:
+        include_rationale = parse_flag(request.query_params.get("rationale"))
+    except ValueError:
+        return JSONResponse({"error": "rationale must be true or false"}, status_code=400)
+    fast = request.query_params.get("mode") == "fast"
+    result = await run_blocking(request, recommend, request.app.state.pool, customer_id, include_rationale, fast)
+    if result is None:
+        return JSONResponse({"error": f"Customer {customer_id} not found"}, status_code=404)
+    return JSONResponse(result)
+
+
+async def batch_recommendations(request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Request body must be JSON"}, status_code=400)
+
+    customer_ids = payload.get("customer_ids") if isinstance(payload, dict) else None
+    if not isinstance(customer_ids, list) or not all(isinstance(c, str) for c in customer_ids):
+        return JSONResponse({"error": "customer_ids must be a list of strings"}, status_code=400)
+    if len(customer_ids) > MAX_BATCH_SIZE:
+        return JSONResponse({"error": f"At most {MAX_BATCH_SIZE} customer_ids per batch"}, status_code=413)
+
+    include_rationale = payload.get("rationale", True)
+    if not isinstance(include_rationale, bool):
+        return JSONResponse({"error": "rationale must be true or false"}, status_code=400)
+    pool = request.app.state.pool
+    results = await asyncio.gather(*(
+        run_blocking(request, recommend, pool, customer_id, include_rationale)
+        for customer_id in customer_ids
+    ))
+    return JSONResponse({
+        "results": [r for r in results if r is not None],
+        "not_found": [c for c, r in zip(customer_ids, results) if r is None],
+    })
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="recommend")
+    app.state.pool = PartitionedPool(PARTITIONS, size=DB_POOL_SIZE)
+    try:
+        yield
+    finally:
+        app.state.executor.shutdown(wait=True)
+        app.state.pool.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/metrics", metrics),
+        Route("/customers/{customer_id}/recommendations", customer_recommendations),
+        Route("/recommendations:batch", batch_recommendations, methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
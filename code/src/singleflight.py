@@ -0,0 +1,68 @@
+"""Coalesce concurrent calls that share a key into one in-flight computation."""
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-safe single-flight group.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running block and receive the same result (or exception). Results are
+    shared between callers, so they must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._calls_total = 0
+        self._executions = 0
+        self._coalesced = 0
+        self._errors = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            self._calls_total += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executions += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self._calls_total,
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "errors": self._errors,
+                "in_flight": len(self._calls),
+            }
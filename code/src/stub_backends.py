@@ -0,0 +1,86 @@
+"""Offline stand-ins for the OpenAI embedding and chat models.
+
+Selected with RECOMMENDER_BACKEND=stub so the app, the HTTP service and the
+tests can run without network access or an API key.
+"""
+import hashlib
+import json
+import math
+import re
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import SimpleChatModel
+from langchain_core.messages import BaseMessage
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+PRODUCT_LINE_PATTERN = re.compile(r"(?:^|Products:)\s*-\s*(?P<name>[^:\n]+):", re.MULTILINE)
+# One customer per line in the batch prompts built by batch_llm.py
+CUSTOMER_LINE_PATTERN = re.compile(r'^\{"customer_id".*\}$', re.MULTILINE)
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class StubEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors, L2-normalised so FAISS scores stay in [0, 4]"""
+
+    def __init__(self, size: int = 64):
+        self.size = size
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for token in tokenize(text):
+            bucket = int(hashlib.md5(token.encode()).hexdigest()[:8], 16) % self.size
+            vector[bucket] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def stub_recommendation_text(prompt):
+    """Echoes the product list from the prompt in the format gpt-4o is asked for"""
+    names = [m.group("name").strip() for m in PRODUCT_LINE_PATTERN.finditer(prompt)]
+    if not names:
+        return "No suitable products found."
+    return "\n".join(
+        f"{i}. {name} - Matches the customer profile - {max(10 - i, 1)}/10"
+        for i, name in enumerate(names, start=1)
+    )
+
+
+def stub_batch_recommendations(prompt, top_n=3):
+    """JSON answer to a batch prompt: the first candidates of every customer in it"""
+    results = []
+    for line in CUSTOMER_LINE_PATTERN.findall(prompt):
+        item = json.loads(line)
+        results.append({"customer_id": item["customer_id"], "recommendations": [
+            {"product_id": product_id, "reason": "Matches the customer profile", "score": max(10 - i, 1)}
+            for i, product_id in enumerate(item["candidates"][:top_n], start=1)
+        ]})
+    return json.dumps({"results": results})
+
+
+def is_json_mode(response_format):
+    return (response_format or {}).get("type") == "json_object"
+
+
+class StubChatModel(SimpleChatModel):
+    """In-process chat model answering with stub_recommendation_text, or JSON when asked for"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _call(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+              run_manager: Any = None, **kwargs: Any) -> str:
+        prompt = "\n".join(str(m.content) for m in messages)
+        if is_json_mode(kwargs.get("response_format")):
+            return stub_batch_recommendations(prompt)
+        return stub_recommendation_text(prompt)
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# app.py builds the database and product index at import time, so point it at
+# a scratch database and the offline models before any test imports it.
+os.environ.setdefault("RECOMMENDER_BACKEND", "stub")
+os.environ.setdefault("DB_FILE", os.path.join(tempfile.mkdtemp(), "customer_data_test.db"))
+os.environ.setdefault("AD_THUMBNAIL_DIR", tempfile.mkdtemp())
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
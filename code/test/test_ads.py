@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+
+import ads
+from ads import AD_CREATIVES, CATALOG, THUMBNAIL_BUCKETS, AdCatalog, bucket_for
+from app import PRODUCTS
+
+
+class TestAdCatalog(unittest.TestCase):
+    def test_creatives_reference_known_products_and_files(self):
+        product_ids = {p["id"] for p in PRODUCTS}
+        for creative in AD_CREATIVES:
+            self.assertTrue(set(creative["product_ids"]) <= product_ids, creative["id"])
+            self.assertTrue(os.path.exists(os.path.join(CATALOG.images_dir, creative["file"])), creative["file"])
+
+    def test_match_follows_product_order_and_segment(self):
+        products = [{"id": 93}, {"id": 54}, {"id": 41}]
+        self.assertEqual([a["id"] for a in CATALOG.match(products, "individual")], ["Ad_15", "Ad_09", "Ad_10"])
+        self.assertEqual([a["id"] for a in CATALOG.match(products, "organization")], ["Ad_15", "Ad_09", "Ad_12"])
+        self.assertEqual(CATALOG.match([{"id": 2}], "individual"), [])
+
+    def test_bucket_for(self):
+        self.assertEqual(bucket_for(100), "small")
+        self.assertEqual(bucket_for(THUMBNAIL_BUCKETS["medium"]), "medium")
+        self.assertEqual(bucket_for(5000), "large")
+
+    def test_thumbnails_generated_once(self):
+        catalog = AdCatalog(thumbnail_dir=tempfile.mkdtemp())
+        path = catalog.thumbnail_path("Ad_01", 200)
+        with Image.open(path) as image:
+            self.assertEqual(image.format, catalog.image_format)
+            self.assertLessEqual(image.width, THUMBNAIL_BUCKETS["small"])
+        self.assertEqual(catalog.thumbnail_path("Ad_01", 240), path)
+
+        # A new process finds the file on disk and does not decode the creative again
+        with patch.object(ads.Image, "open") as image_open:
+            self.assertEqual(AdCatalog(thumbnail_dir=catalog.thumbnail_dir).thumbnail_path("Ad_01", 200), path)
+            image_open.assert_not_called()
+
+    def test_jpeg_fallback_for_transparent_source(self):
+        catalog = AdCatalog(thumbnail_dir=tempfile.mkdtemp(), image_format="JPEG")
+        with Image.open(catalog.thumbnail_path("Ad_01", 480)) as image:
+            self.assertEqual((image.format, image.mode), ("JPEG", "RGB"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import json
+import unittest
+
+import httpx
+import openai
+from langchain_core.messages import AIMessage
+
+from batch_llm import BatchRecommender, compact_profile, compare, format_rationale, load_items
+from stub_backends import stub_batch_recommendations
+
+REQUEST = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+
+
+class ScriptedLLM:
+    """Chat model stand-in answering batches through a function of the prompt"""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def bind(self, **kwargs):
+        return self
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return self.answer(prompt, len(self.prompts))
+
+
+def drop_customer(customer_id):
+    def answer(prompt, call):
+        data = json.loads(stub_batch_recommendations(prompt))
+        results = data["results"]
+        if len(results) > 1:
+            results = [r for r in results if r["customer_id"] != customer_id]
+        return AIMessage(content=json.dumps({"results": results}))
+    return answer
+
+
+class TestBatchRecommendations(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pairs, cls.items = load_items()
+
+    def test_compact_profile(self):
+        profile = compact_profile({
+            "customer_id": "C1", "type": "individual", "age": 30, "gender": None, "interests": "",
+            "social_media": [{"intent": "Travel Interest"}, {"intent": "Travel Interest"}],
+            "transactions": [{"category": "Travel", "amount_usd": 900}, {"category": "Dining", "amount_usd": 50}],
+        })
+        self.assertEqual(profile, {"type": "individual", "age": 30, "intents": ["Travel Interest"],
+                                   "top_spend": ["Travel", "Dining"]})
+
+    def test_pack_respects_budget_and_order(self):
+        recommender = BatchRecommender(token_budget=1500, max_batch_size=4)
+        batches = list(recommender.pack(self.items))
+        self.assertGreater(len(batches), 1)
+        self.assertTrue(all(len(batch) <= 4 for batch in batches))
+        self.assertEqual([item for batch in batches for item in batch], self.items)
+
+    def test_batch_results(self):
+        recommender = BatchRecommender()
+        results = recommender.recommend(self.items)
+        self.assertEqual(set(results), {item["customer_id"] for item in self.items})
+        self.assertLess(recommender.requests, len(self.items))
+        candidates = {item["customer_id"]: item["candidates"] for item in self.items}
+        for customer_id, recommendations in results.items():
+            self.assertTrue(all(r["product_id"] in candidates[customer_id] for r in recommendations))
+        self.assertTrue(format_rationale(results[self.items[0]["customer_id"]]).startswith("1. "))
+
+    def test_missing_item_retried_individually(self):
+        dropped = self.items[0]["customer_id"]
+        llm = ScriptedLLM(drop_customer(dropped))
+        recommender = BatchRecommender(llm)
+        results = recommender.recommend(self.items)
+        self.assertIn(dropped, results)
+        self.assertEqual(recommender.retried, 1)
+        self.assertEqual(recommender.failed, [])
+
+    def test_malformed_entries_retried_individually(self):
+        first, second = self.items[0], self.items[1]
+
+        def answer(prompt, call):
+            if call > 1:
+                return AIMessage(content=stub_batch_recommendations(prompt))
+            data = json.loads(stub_batch_recommendations(prompt))
+            malformed = {first["customer_id"], second["customer_id"]}
+            data["results"] = [r for r in data["results"] if r["customer_id"] not in malformed]
+            data["results"] += [
+                {"customer_id": [first["customer_id"]], "recommendations": []},
+                {"customer_id": first["customer_id"], "recommendations": 7},
+                {"customer_id": second["customer_id"],
+                 "recommendations": [{"product_id": [1]}, {"product_id": {"id": 1}}, {"product_id": True}, "x"]},
+            ]
+            return AIMessage(content=json.dumps(data))
+
+        recommender = BatchRecommender(ScriptedLLM(answer))
+        results = recommender.recommend(self.items)
+        self.assertEqual(set(results), {item["customer_id"] for item in self.items})
+        self.assertEqual(recommender.retried, 2)
+        self.assertEqual(recommender.failed, [])
+        self.assertEqual(BatchRecommender(ScriptedLLM(answer)).parse({"results": 3}, self.items), {})
+
+    def test_transport_errors_back_off_without_per_item_retries(self):
+        def flaky(prompt, call):
+            if call <= 2:
+                raise openai.RateLimitError("429 Too Many Requests", response=httpx.Response(429, request=REQUEST),
+                                            body=None)
+            return AIMessage(content=stub_batch_recommendations(prompt))
+
+        recommender = BatchRecommender(ScriptedLLM(flaky), retry_delay=0)
+        results = recommender.recommend(self.items)
+        self.assertEqual(len(results), len(self.items))
+        self.assertEqual(recommender.transport_errors, 2)
+        self.assertEqual(recommender.requests, recommender.batches + 2)
+        self.assertEqual(recommender.retried, 0)
+
+    def test_outage_fails_batches_without_request_storm(self):
+        def down(prompt, call):
+            raise openai.APITimeoutError(request=REQUEST)
+
+        recommender = BatchRecommender(ScriptedLLM(down), max_attempts=3, retry_delay=0)
+        self.assertEqual(recommender.recommend(self.items), {})
+        self.assertEqual(recommender.failed, [item["customer_id"] for item in self.items])
+        self.assertEqual(recommender.requests, recommender.batches * 3)
+        self.assertEqual(recommender.retried, 0)
+
+    def test_non_transient_errors_propagate(self):
+        def rejected(prompt, call):
+            raise openai.BadRequestError("context length exceeded", response=httpx.Response(400, request=REQUEST),
+                                         body=None)
+
+        recommender = BatchRecommender(ScriptedLLM(rejected), retry_delay=0)
+        with self.assertRaises(openai.BadRequestError):
+            recommender.recommend(self.items)
+        self.assertEqual(recommender.requests, 1)
+        self.assertEqual(recommender.transport_errors, 0)
+
+    def test_budget_shrinks_on_unparseable_response(self):
+        llm = ScriptedLLM(lambda prompt, call: AIMessage(content='{"results": [' if call == 1
+                                                         else stub_batch_recommendations(prompt)))
+        recommender = BatchRecommender(llm, token_budget=4000, min_token_budget=1000)
+        results = recommender.recommend(self.items)
+        self.assertEqual(len(results), len(self.items))
+        self.assertLess(recommender.budget, 4000)
+        self.assertGreater(recommender.retried, 0)
+
+    def test_report(self):
+        report = compare()
+        self.assertEqual(report["customers"], len(self.items))
+        self.assertEqual(report["single"]["requests_per_customer"], 1.0)
+        self.assertLess(report["batch"]["requests_per_customer"], 1.0)
+        self.assertLess(report["batch"]["prompt_tokens_per_customer"], report["single"]["prompt_tokens_per_customer"])
+
+
+if __name__ == "__main__":
+    unittest.main()
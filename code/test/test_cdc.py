@@ -0,0 +1,117 @@
+import sqlite3
+import unittest
+
+from app import (
+    DB_FILE, compute_recommendations, get_customer_details, get_customer_version, get_precomputed_products,
+    vector_search,
+)
+from cdc import RefreshWorker, enqueue_all, queue_stats
+from change_queue import throttle, wait_for_capacity
+from sentiment import score_unscored_posts
+
+
+class TestChangeDataCapture(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(DB_FILE)
+        RefreshWorker().run(once=True)
+
+    def tearDown(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM transaction_history WHERE product_id = 9999")
+        RefreshWorker().run(once=True)
+        self.conn.close()
+
+    def add_transaction(self, customer_id):
+        with self.conn:
+            self.conn.execute("INSERT INTO transaction_history VALUES (?, 9999, 'Purchase', 'Travel', 1200, "
+                              "'2025-01-01', 'Credit Card')", (customer_id,))
+
+    def test_trigger_queues_change_and_worker_refreshes(self):
+        self.add_transaction("CUST2025A")
+        self.assertIsNone(get_precomputed_products("CUST2025A"))
+        self.assertGreaterEqual(queue_stats(self.conn)["customers_pending"], 1)
+
+        worker = RefreshWorker()
+        worker.run(once=True)
+        self.assertEqual(queue_stats(self.conn)["depth"], 0)
+        expected = vector_search(get_customer_details("CUST2025A"))
+        self.assertEqual(get_precomputed_products("CUST2025A"), expected)
+        self.assertEqual(compute_recommendations("CUST2025A", include_rationale=False)[1], expected)
+        stats = worker.stats()
+        self.assertEqual(stats["customers_refreshed"], 1)
+        self.assertIsNotNone(stats["lag_ms"]["p95"])
+
+    def test_customer_without_profile(self):
+        # Posts and transactions can exist for ids that have no profile row
+        self.add_transaction("CUST2099X")
+        worker = RefreshWorker()
+        worker.run(once=True)
+        self.assertEqual(worker.stats()["errors"], 0)
+        self.assertEqual(queue_stats(self.conn)["depth"], 0)
+        self.assertIsNone(get_precomputed_products("CUST2099X"))
+
+    def test_batch_size_adapts(self):
+        enqueue_all(self.conn)
+        worker = RefreshWorker(min_batch=2, max_batch=8, target_batch_seconds=60)
+        worker.run(once=True)
+        self.assertEqual(worker.batch_size, 8)
+        self.assertGreater(worker.stats()["batches"], 1)
+        self.assertEqual(queue_stats(self.conn)["depth"], 0)
+
+    def test_sentiment_scoring_queues_nothing(self):
+        original = self.conn.execute("SELECT rowid, sentiment_score, intent FROM social_media_sentiment "
+                                     "WHERE customer_id = 'CUST2025A'").fetchall()
+        with self.conn:
+            self.conn.execute("UPDATE social_media_sentiment SET sentiment_score = NULL WHERE customer_id = 'CUST2025A'")
+        self.assertGreater(score_unscored_posts(self.conn)["scored"], 0)
+        self.assertEqual(queue_stats(self.conn)["depth"], 0)
+        with self.conn:
+            self.conn.executemany("UPDATE social_media_sentiment SET sentiment_score = ?, intent = ? WHERE rowid = ?",
+                                  [(score, intent, rowid) for rowid, score, intent in original])
+            # Columns the similarity query reads are still tracked
+            self.conn.execute("UPDATE social_media_sentiment SET content = content || '!' WHERE rowid = ?",
+                              (original[0][0],))
+        self.assertEqual(queue_stats(self.conn)["customers_pending"], 1)
+        with self.conn:
+            self.conn.execute("UPDATE social_media_sentiment SET content = substr(content, 1, length(content) - 1) "
+                              "WHERE rowid = ?", (original[0][0],))
+
+    def test_customer_version(self):
+        before = get_customer_version("CUST2025A")
+        self.add_transaction("CUST2025B")
+        self.assertEqual(get_customer_version("CUST2025A"), before)
+        self.add_transaction("CUST2025A")
+        queued = get_customer_version("CUST2025A")
+        self.assertNotEqual(queued, before)
+        # Draining the change log keeps the version
+        RefreshWorker().run(once=True)
+        self.assertEqual(get_customer_version("CUST2025A"), queued)
+
+    def test_backpressure(self):
+        self.add_transaction("CUST2025B")
+        self.assertFalse(wait_for_capacity(self.conn, high_watermark=1, timeout=0))
+        RefreshWorker().run(once=True)
+        self.assertTrue(wait_for_capacity(self.conn, high_watermark=1, timeout=0))
+
+    def test_throttle(self):
+        self.add_transaction("CUST2025B")
+        with self.assertRaises(TimeoutError):
+            throttle(self.conn, high_watermark=1, timeout=0)
+        # Files without a change log are not throttled
+        throttle(sqlite3.connect(":memory:"), high_watermark=1, timeout=0)
+
+    def test_enqueue_all_waits_for_worker(self):
+        worker = RefreshWorker(idle_sleep=0.01, max_idle_sleep=0.05)
+        thread = worker.start()
+        try:
+            self.assertEqual(enqueue_all(self.conn, chunk_size=5, high_watermark=5), 25)
+        finally:
+            worker.stop()
+            thread.join()
+        RefreshWorker().run(once=True)
+        self.assertEqual(worker.stats()["errors"], 0)
+        self.assertGreater(worker.stats()["batches"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
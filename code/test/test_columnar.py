@@ -0,0 +1,95 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from app import DB_FILE
+from columnar import (
+    CURRENT_FILE, current_version, customer_features, customer_filter, export_snapshot, load_table,
+    sqlite_row_features, to_numpy_columns,
+)
+
+
+class TestColumnarSnapshot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.snapshot_dir = os.path.join(tempfile.mkdtemp(), "snapshot")
+        cls.counts = export_snapshot(DB_FILE, cls.snapshot_dir)
+
+    def test_export_counts(self):
+        for table, count in self.counts.items():
+            self.assertEqual(load_table(table, snapshot_dir=self.snapshot_dir).num_rows, count)
+
+    def test_refresh_replaces_snapshot(self):
+        export_snapshot(DB_FILE, self.snapshot_dir)
+        self.assertEqual(sorted(os.listdir(self.snapshot_dir)), sorted(self.counts))
+        self.assertEqual(load_table("transaction_history", snapshot_dir=self.snapshot_dir).num_rows,
+                         self.counts["transaction_history"])
+
+    def test_refresh_swaps_versions(self):
+        table_dir = os.path.join(self.snapshot_dir, "transaction_history")
+        previous = current_version(table_dir)
+        export_snapshot(DB_FILE, self.snapshot_dir)
+        current = current_version(table_dir)
+        self.assertNotEqual(current, previous)
+        # The previous version stays readable for scans that started before the swap
+        self.assertEqual(sorted(os.listdir(table_dir)),
+                         sorted([CURRENT_FILE, os.path.basename(previous), os.path.basename(current)]))
+        export_snapshot(DB_FILE, self.snapshot_dir)
+        self.assertFalse(os.path.exists(previous))
+
+    def test_missing_table(self):
+        db_file = os.path.join(tempfile.mkdtemp(), "shared_only.db")
+        sqlite3.connect(db_file).close()
+        with self.assertRaisesRegex(ValueError, "customer_profile_ind"):
+            export_snapshot(db_file, os.path.join(os.path.dirname(db_file), "snapshot"))
+
+    def test_empty_table_keeps_schema(self):
+        db_file = os.path.join(tempfile.mkdtemp(), "empty.db")
+        shutil.copy(DB_FILE, db_file)
+        with sqlite3.connect(db_file) as conn:
+            conn.execute("DELETE FROM transaction_history")
+        snapshot_dir = os.path.join(os.path.dirname(db_file), "snapshot")
+        export_snapshot(db_file, snapshot_dir)
+        table = load_table("transaction_history", snapshot_dir=snapshot_dir)
+        self.assertEqual(table.num_rows, 0)
+        self.assertIn("customer_id", table.column_names)
+        features = customer_features(snapshot_dir)
+        self.assertTrue(all(row["amount_usd_count"] is None for row in features.to_pylist()))
+
+    def test_filtered_load_and_numpy_columns(self):
+        table = load_table("transaction_history", ["customer_id", "amount_usd"],
+                           filter=pc.field("customer_id") == "CUST2025A", snapshot_dir=self.snapshot_dir)
+        columns = to_numpy_columns(table)
+        self.assertEqual(set(np.concatenate(columns["customer_id"])), {"CUST2025A"})
+        for chunk in columns["amount_usd"]:
+            self.assertEqual(chunk.dtype.kind, "i")
+            # Zero-copy views of Arrow buffers are read-only
+            self.assertFalse(chunk.flags.writeable)
+
+    def test_customer_filter_prunes_buckets(self):
+        path = current_version(os.path.join(self.snapshot_dir, "transaction_history"))
+        dataset = ds.dataset(path, format="parquet", partitioning="hive")
+        fragments = list(dataset.get_fragments(filter=customer_filter("CUST2025A")))
+        self.assertEqual(len(fragments), 1)
+        table = load_table("transaction_history", filter=customer_filter("CUST2025A"), snapshot_dir=self.snapshot_dir)
+        expected = load_table("transaction_history", filter=pc.field("customer_id") == "CUST2025A",
+                              snapshot_dir=self.snapshot_dir)
+        self.assertEqual(table.num_rows, expected.num_rows)
+
+    def test_features_match_sqlite_row_path(self):
+        arrow = {row["customer_id"]: row for row in customer_features(self.snapshot_dir).to_pylist()}
+        rows = sqlite_row_features(DB_FILE)
+        self.assertEqual(set(arrow), set(rows))
+        for customer_id, expected in rows.items():
+            self.assertEqual(arrow[customer_id]["amount_usd_sum"] or 0, expected["amount_usd_sum"])
+            self.assertEqual(arrow[customer_id]["sentiment_score_count"] or 0, expected["sentiment_score_count"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import app
+
+
+class TestCustomerIndex(unittest.TestCase):
+    def setUp(self):
+        self.db_file = os.path.join(tempfile.mkdtemp(), "index_test.db")
+        self.patchers = [
+            patch.object(app, "DB_FILE", self.db_file),
+            patch.object(app, "PARTITIONS", app.partitions.PartitionMap(self.db_file)),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        app.init_db()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_all_customer_ids_sorted(self):
+        customer_ids = app.get_all_customer_ids()
+        self.assertEqual(len(customer_ids), 25)
+        self.assertEqual(customer_ids, sorted(customer_ids))
+
+    def test_prefix_search(self):
+        self.assertEqual(app.search_customer_ids("ORG_US_01"), ["ORG_US_010", "ORG_US_011", "ORG_US_012"])
+        self.assertEqual(app.search_customer_ids("NOPE"), [])
+
+    def test_keyset_pagination(self):
+        first = app.search_customer_ids("CUST", limit=10)
+        second = app.search_customer_ids("CUST", after=first[-1], limit=10)
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 5)
+        self.assertEqual(first + second, [c for c in app.get_all_customer_ids() if c.startswith("CUST")])
+
+    def test_index_follows_profile_tables(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("INSERT INTO customer_profile_ind (customer_id, age) VALUES ('CUST2026Z', 30)")
+        conn.execute("DELETE FROM customer_profile_org WHERE customer_id = 'ORG_US_012'")
+        conn.commit()
+        conn.close()
+        self.assertEqual(app.search_customer_ids("CUST2026"), ["CUST2026Z"])
+        self.assertNotIn("ORG_US_012", app.get_all_customer_ids())
+
+    def test_backfill_only_when_index_created(self):
+        # A database from before the index: no table and no triggers
+        conn = sqlite3.connect(self.db_file)
+        for (trigger,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_index_%'").fetchall():
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP TABLE customer_index")
+        conn.commit()
+        app.init_db()
+        self.assertEqual(len(app.get_all_customer_ids()), 25)
+        # A row missing from an existing index is not re-added on every startup
+        conn.execute("DELETE FROM customer_index WHERE customer_id = 'ORG_US_012'")
+        conn.commit()
+        app.init_db()
+        conn.close()
+        self.assertNotIn("ORG_US_012", app.get_all_customer_ids())
+
+
+if __name__ == "__main__":
+    unittest.main()
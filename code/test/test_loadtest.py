@@ -0,0 +1,48 @@
+import base64
+import unittest
+
+import numpy as np
+from starlette.testclient import TestClient
+
+import app
+from loadtest import run_ramp
+from mock_openai import MockSettings, create_app
+
+
+class TestMockOpenAI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(create_app(MockSettings(embedding_latency_ms=0, chat_latency_ms=0)))
+
+    def test_embeddings_float_and_base64(self):
+        plain = self.client.post("/v1/embeddings", json={"input": ["travel credit card"]}).json()
+        encoded = self.client.post("/v1/embeddings", json={"input": "travel credit card", "encoding_format": "base64"}).json()
+        decoded = np.frombuffer(base64.b64decode(encoded["data"][0]["embedding"]), dtype=np.float32)
+        np.testing.assert_allclose(decoded, plain["data"][0]["embedding"], rtol=1e-6)
+
+    def test_chat_completion(self):
+        body = self.client.post("/v1/chat/completions", json={
+            "model": "gpt-4o", "messages": [{"role": "user", "content": "Products:\n- Savings Account: everyday"}],
+        }).json()
+        self.assertIn("Savings Account", body["choices"][0]["message"]["content"])
+        self.assertGreater(body["usage"]["total_tokens"], 0)
+
+    def test_injected_errors(self):
+        client = TestClient(create_app(MockSettings(embedding_latency_ms=0, error_rate=1.0)))
+        self.assertEqual(client.post("/v1/embeddings", json={"input": ["x"]}).status_code, 500)
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_ramp_report(self):
+        report = run_ramp(app, [1, 3], 2, app.get_all_customer_ids())
+        self.assertEqual([level["requests"] for level in report["levels"]], [2, 6])
+        for level in report["levels"]:
+            self.assertEqual(level["errors"], 0)
+            self.assertEqual(level["empty_rate"], 0.0)
+            self.assertIsNotNone(level["latency_ms"]["p95"])
+            self.assertEqual(set(level["stage_ms"]), {"db", "search", "llm"})
+            self.assertIsNotNone(level["stage_ms"]["db"]["p50"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import app
+from columnar import export_snapshot, load_table
+from partitions import PartitionMap, rebalance
+from sentiment import score_partitions
+
+
+class TestPartitionMap(unittest.TestCase):
+    def test_hash_routing(self):
+        partition_map = PartitionMap("/data/customers.db", "hash:4")
+        self.assertEqual(len(partition_map.all_paths()), 4)
+        self.assertEqual(partition_map.path("h2"), "/data/customers.h2.db")
+        ids = [f"CUST{i:05d}" for i in range(200)]
+        self.assertEqual(len(partition_map.group(ids)), 4)
+        # Routing depends only on the id, so every process agrees
+        self.assertEqual(partition_map.path_for("CUST00042"),
+                         PartitionMap("/data/customers.db", "hash:4").path_for("CUST00042"))
+
+    def test_region_routing_and_prefix_pruning(self):
+        partition_map = PartitionMap("/data/customers.db", "region:US,IN")
+        self.assertEqual(partition_map.path_for("ORG_US_004"), "/data/customers.US.db")
+        self.assertEqual(partition_map.path_for("ORG_UK_001"), "/data/customers.other.db")
+        self.assertEqual(partition_map.path_for("CUST2025A"), "/data/customers.other.db")
+        self.assertEqual(partition_map.paths_for_prefix("ORG_US_0"), ["/data/customers.US.db"])
+        self.assertEqual(len(partition_map.paths_for_prefix("ORG_U")), 3)
+
+    def test_unpartitioned(self):
+        partition_map = PartitionMap("/data/customers.db")
+        self.assertFalse(partition_map.partitioned)
+        self.assertEqual(partition_map.all_paths(), ["/data/customers.db"])
+
+    def test_invalid_spec(self):
+        for spec in ("hash:0", "region:", "range:4"):
+            with self.assertRaises(ValueError):
+                PartitionMap("/data/customers.db", spec)
+
+
+class TestPartitionedStorage(unittest.TestCase):
+    def setUp(self):
+        self.db_file = os.path.join(tempfile.mkdtemp(), "customers.db")
+        self.use_partitions("")
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute("UPDATE customer_profile_ind SET age = 99 WHERE customer_id = 'CUST2025A'")
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def stored_ids(self, path):
+        with sqlite3.connect(path) as conn:
+            return {row[0] for table in app.partitions.CUSTOMER_TABLES
+                    for row in conn.execute(f"SELECT customer_id FROM {table}")}
+
+    def use_partitions(self, spec):
+        if hasattr(self, "patcher"):
+            self.patcher.stop()
+        self.partitions = PartitionMap(self.db_file, spec)
+        self.patcher = patch.multiple(app, DB_FILE=self.db_file, PARTITIONS=self.partitions)
+        self.patcher.start()
+        for path in self.partitions.all_paths():
+            app.init_db(path)
+
+    def test_rebalance_into_hash_partitions_and_back(self):
+        # Includes ids that only have posts or transactions
+        all_ids = self.stored_ids(self.db_file)
+        self.use_partitions("hash:3")
+        moved = rebalance(self.partitions, chunk_size=4)
+        self.assertEqual(sum(moved.values()), len(all_ids))
+        self.assertEqual(rebalance(self.partitions), {})
+
+        self.assertEqual(self.stored_ids(self.db_file), set())
+        for path in self.partitions.all_paths():
+            for customer_id in self.stored_ids(path):
+                self.assertEqual(self.partitions.path_for(customer_id), path)
+
+        customer_ids = app.get_all_customer_ids()
+        self.assertEqual(len(customer_ids), 25)
+        self.assertEqual(customer_ids, sorted(customer_ids))
+        # Rebalanced rows win over the seed rows already in the new files
+        self.assertEqual(app.get_customer_details("CUST2025A")["age"], 99)
+        self.assertEqual([c["customer_id"] for c in app.get_customers(["ORG_US_004", "CUST2025A"])],
+                         ["ORG_US_004", "CUST2025A"])
+
+        first = app.search_customer_ids("CUST", limit=10)
+        second = app.search_customer_ids("CUST", after=first[-1], limit=10)
+        self.assertEqual(first + second, [c for c in customer_ids if c.startswith("CUST")])
+
+        self.use_partitions("")
+        self.assertEqual(sum(rebalance(self.partitions).values()), len(all_ids))
+        self.assertEqual(self.stored_ids(self.db_file), all_ids)
+
+    def test_rebalance_ignores_undrained_source_log(self):
+        # Nothing drains DB_FILE's change log once it is outside the spec
+        with sqlite3.connect(self.db_file) as conn:
+            conn.executemany("INSERT INTO customer_change_log (customer_id, table_name) VALUES (?, 'test')",
+                             [("CUST2099X",)] * 100)
+        self.use_partitions("hash:2")
+        for path in self.partitions.all_paths():
+            with sqlite3.connect(path) as conn:
+                conn.execute("DELETE FROM customer_change_log")
+        rebalance(self.partitions, high_watermark=100)
+        with sqlite3.connect(self.db_file) as conn:
+            queued = {row[0] for row in conn.execute("SELECT DISTINCT customer_id FROM customer_change_log")}
+        # Changes of the moved customers left with them
+        self.assertEqual(queued, {"CUST2099X"})
+
+    def test_batch_jobs_cover_all_partitions(self):
+        self.use_partitions("hash:2")
+        rebalance(self.partitions)
+        posts = 0
+        for path in self.partitions.all_paths():
+            with sqlite3.connect(path) as conn:
+                posts += conn.execute("UPDATE social_media_sentiment SET sentiment_score = NULL").rowcount
+        self.assertGreater(posts, 0)
+        stats = score_partitions(self.partitions)
+        self.assertEqual(stats["scored"], posts)
+        self.assertEqual(set(stats["files"]), set(self.partitions.all_paths()))
+
+        snapshot_dir = os.path.join(os.path.dirname(self.db_file), "snapshot")
+        counts = export_snapshot(out_dir=snapshot_dir, partition_map=self.partitions)
+        self.assertEqual(counts["social_media_sentiment"], posts)
+        customer_ids = set(load_table("customer_profile_ind", ["customer_id"], snapshot_dir=snapshot_dir)
+                           .column("customer_id").to_pylist())
+        self.assertEqual(customer_ids, {c for c in app.get_all_customer_ids() if c.startswith("CUST")})
+
+    def test_dry_run_moves_nothing(self):
+        self.use_partitions("region:US")
+        moved = rebalance(self.partitions, dry_run=True)
+        self.assertEqual(moved[f"{self.db_file} -> {self.partitions.path('US')}"],
+                         len([c for c in self.stored_ids(self.db_file) if c.startswith("ORG_US_")]))
+        with sqlite3.connect(self.db_file) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM customer_index").fetchone()[0], 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
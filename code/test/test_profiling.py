@@ -0,0 +1,85 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import profiling
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiling(unittest.TestCase):
+    def test_profile_run_writes_tagged_outputs(self):
+        out_dir = tempfile.mkdtemp()
+        with profiling.profile_run("CUST2025A", out_dir=out_dir, interval=0.001) as run:
+            with profiling.stage("get_customer_details"):
+                busy(0.02)
+            with profiling.stage("vector_search"):
+                busy(0.05)
+
+        self.assertEqual([name for name, _, _ in run.stages], ["get_customer_details", "vector_search"])
+        self.assertEqual(set(run.paths), {"collapsed", "report", "pstats"})
+        self.assertTrue(all(os.path.exists(p) for p in run.paths.values()))
+        self.assertIn("CUST2025A", os.path.basename(run.paths["report"]))
+
+        with open(run.paths["collapsed"]) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any(line.startswith("stage:vector_search;") and "busy" in line for line in lines))
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+
+        with open(run.paths["report"]) as f:
+            report = f.read()
+        self.assertIn("customer_id: CUST2025A", report)
+        self.assertIn("vector_search", report)
+        self.assertIn("cumulative", report)
+
+    def test_nested_profile_run_restores_outer_timer(self):
+        with profiling.time_stages() as stages:
+            with profiling.profile_run("CUST2025A", out_dir=tempfile.mkdtemp(), interval=0.001):
+                pass
+            with profiling.stage("vector_search"):
+                pass
+        self.assertIn("vector_search", stages)
+
+    def test_prune_keeps_newest_runs(self):
+        out_dir = tempfile.mkdtemp()
+        for run in ("20250101-000000-000001_A", "20250101-000000-000002_B", "20250101-000000-000003_C"):
+            for ext in (".txt", ".collapsed"):
+                open(os.path.join(out_dir, run + ext), "w").close()
+        profiling.prune_runs(out_dir, max_runs=2)
+        self.assertEqual(sorted(os.listdir(out_dir)), [
+            "20250101-000000-000002_B.collapsed", "20250101-000000-000002_B.txt",
+            "20250101-000000-000003_C.collapsed", "20250101-000000-000003_C.txt",
+        ])
+
+    def test_query_parameter_needs_opt_in(self):
+        with patch.multiple(profiling, PROFILE_ENABLED=False, PROFILE_QUERY_ENABLED=False):
+            self.assertFalse(profiling.profile_requested("1"))
+        with patch.multiple(profiling, PROFILE_ENABLED=False, PROFILE_QUERY_ENABLED=True):
+            self.assertTrue(profiling.profile_requested("1"))
+            self.assertFalse(profiling.profile_requested(None))
+
+    def test_stage_is_noop_without_active_run(self):
+        with profiling.stage("vector_search"):
+            pass
+
+    def test_time_stages(self):
+        with profiling.time_stages() as stages:
+            for _ in range(2):
+                with profiling.stage("vector_search"):
+                    busy(0.01)
+        self.assertEqual(set(stages), {"vector_search"})
+        self.assertGreaterEqual(stages["vector_search"], 0.02)
+        # Markers outside the block are no-ops again
+        with profiling.stage("vector_search"):
+            pass
+        self.assertIsNone(getattr(profiling._active, "run", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
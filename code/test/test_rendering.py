@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import patch
+
+import rendering
+
+
+CUSTOMER = {
+    "customer_id": "CUST2025A", "type": "individual", "age": 25, "gender": "F", "location": "New York",
+    "occupation": "Marketing Manager", "education": "Master's", "income_per_year": 180000,
+    "interests": "Luxury Shopping", "preferences": "Discounts",
+    "social_media": [{"platform": "Instagram", "timestamp": "11/20/24", "content": "<script>alert(1)</script>",
+                      "sentiment_score": 0.7, "intent": "Sales"}],
+    "transactions": [{"category": "Gucci", "amount_usd": 3000}, {"category": "Dining", "amount_usd": 200}],
+}
+PRODUCTS = [{"id": 1, "name": "Savings Account", "description": "Everyday", "similarity": "55.0%"}]
+
+
+class TestRendering(unittest.TestCase):
+    def setUp(self):
+        rendering.FRAGMENTS = rendering.FragmentCache()
+
+    def test_fragments_escape_and_include_fields(self):
+        profile, social, transactions = rendering.customer_fragments(CUSTOMER)
+        self.assertIn("Master&#x27;s", profile)
+        self.assertIn("$180,000", profile)
+        self.assertIn("&lt;script&gt;", social)
+        self.assertNotIn("<script>", social)
+        self.assertIn("$3,200", transactions)
+        self.assertNotIn("\n\n", profile + social + transactions)
+
+    def test_one_markdown_call_per_section(self):
+        with patch.object(rendering, "st") as st:
+            rendering.render_customer_profile(CUSTOMER)
+            rendering.render_recommendations(PRODUCTS, "1. Savings Account")
+        self.assertEqual(st.markdown.call_count, 5)
+
+    def test_fragments_memoized_by_customer_data(self):
+        other = dict(CUSTOMER, customer_id="CUST2025B")
+        with patch.object(rendering, "profile_fragment", wraps=rendering.profile_fragment) as build:
+            rendering.customer_fragments(CUSTOMER)
+            rendering.customer_fragments(other)
+            rendering.customer_fragments(dict(CUSTOMER))
+            self.assertEqual(build.call_count, 2)
+            # A change to one customer rebuilds only that customer's fragments
+            changed = rendering.customer_fragments(dict(CUSTOMER, location="Boston"))
+            rendering.customer_fragments(other)
+            self.assertEqual(build.call_count, 3)
+        self.assertIn("Boston", changed[0])
+
+    def test_cache_is_bounded(self):
+        cache = rendering.FragmentCache(max_entries=2)
+        for key in range(3):
+            cache.get(key, lambda: key)
+        self.assertEqual(list(cache._entries), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
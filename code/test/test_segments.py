@@ -0,0 +1,69 @@
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+import app
+import segments
+from app import RECOMMENDATION_PROMPT, get_customer_details, get_segment_recommendations, recommendation_inputs
+from segments import build_segments, compare_with_per_customer, segment_summary
+
+
+class TestSegments(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.summary = build_segments(n_clusters=4, niter=10)
+
+    def test_build_summary(self):
+        self.assertEqual(self.summary["customers"], 25)
+        self.assertTrue(1 <= self.summary["segments"] <= 4)
+
+    def test_fast_mode_serves_segment_recommendation(self):
+        customer, products, rationale = get_segment_recommendations("CUST2025A")
+        self.assertEqual(customer["customer_id"], "CUST2025A")
+        self.assertTrue(products)
+        self.assertIsNotNone(rationale)
+
+    def test_fast_mode_unknown_customer(self):
+        customer, products, rationale = get_segment_recommendations("INVALID_ID")
+        self.assertEqual(products, [])
+        self.assertIsNone(rationale)
+
+    def test_report(self):
+        with patch.object(app, "get_precomputed_products", side_effect=AssertionError("precomputed rows read")):
+            report = compare_with_per_customer()
+        self.assertEqual(report["customers"], 25)
+        self.assertTrue(0.0 <= report["mean_product_overlap"] <= 1.0)
+        self.assertIn("p95_ms", report["fast_mode"])
+
+    def test_rationale_prompt_is_deidentified(self):
+        prompts = []
+
+        def record_prompt(customer_data, products):
+            prompts.append(RECOMMENDATION_PROMPT.format(**recommendation_inputs(customer_data, products)))
+            return "rationale"
+
+        with patch.object(segments, "get_llm_recommendations", side_effect=record_prompt):
+            build_segments(n_clusters=4, niter=10)
+        conn = sqlite3.connect(app.DB_FILE)
+        prototypes = dict(conn.execute("SELECT segment_id, prototype_customer_id FROM customer_segment").fetchall())
+        conn.close()
+        self.assertEqual(len(prompts), len(prototypes))
+        for prompt, prototype in zip(prompts, prototypes.values()):
+            customer = get_customer_details(prototype)
+            self.assertNotIn(prototype, prompt)
+            if customer.get("income_per_year"):
+                self.assertNotIn(str(customer["income_per_year"]), prompt)
+
+    def test_segment_summary(self):
+        summary = segment_summary([
+            {"customer_id": "C1", "type": "individual", "occupation": "Teacher", "income_per_year": 85000,
+             "interests": "Books, Travel", "location": "Seattle"},
+            {"customer_id": "C2", "type": "individual", "occupation": "Teacher", "income_per_year": 60000,
+             "interests": "Travel, Art", "location": "Boston"},
+        ])
+        self.assertEqual(summary, {"type": "individual", "segment_size": 2, "occupation": "Teacher",
+                                   "income_band": "$50k-$100k", "interests": "Travel, Books, Art"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from sentiment import DEFAULT_INTENT, score_posts, score_unscored_posts
+
+
+class TestSentiment(unittest.TestCase):
+    def test_score_posts(self):
+        scores, intents = score_posts([
+            "Loving my new fitness tracker!",
+            "Why do banks charge so many hidden fees?",
+            "I do not love this",
+            "",
+        ])
+        self.assertGreater(scores[0], 0)
+        self.assertLess(scores[1], 0)
+        self.assertLess(scores[2], 0)
+        self.assertEqual(scores[3], 0)
+        self.assertEqual(intents[:2], ["Fitness Interest", "Bank Fee Complaint"])
+        self.assertEqual(intents[3], DEFAULT_INTENT)
+        self.assertTrue(all(-1 <= s <= 1 for s in scores))
+
+    def test_score_unscored_posts_is_incremental(self):
+        conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(), "sentiment_test.db"))
+        conn.execute("""CREATE TABLE social_media_sentiment (
+            customer_id TEXT, post_id TEXT, platform TEXT, content TEXT, timestamp TEXT,
+            sentiment_score REAL, intent TEXT, PRIMARY KEY (customer_id, post_id))""")
+        conn.executemany("INSERT INTO social_media_sentiment VALUES (?, ?, 'Twitter', ?, '', ?, ?)", [
+            ("C1", "1", "Planning a trip to Europe. Any travel tips?", None, None),
+            ("C1", "2", "Struggling to stick to my budget", None, None),
+            ("C2", "3", "Seeded post", 0.5, "Seeded Intent"),
+            ("C2", "4", None, None, None),
+        ])
+        conn.commit()
+
+        stats = score_unscored_posts(conn, chunk_size=2)
+        self.assertEqual(stats["scored"], 3)
+        rows = dict(conn.execute("SELECT post_id, intent FROM social_media_sentiment").fetchall())
+        self.assertEqual(rows, {"1": "Travel Interest", "2": "Budget Concern", "3": "Seeded Intent", "4": DEFAULT_INTENT})
+        self.assertEqual(score_unscored_posts(conn)["scored"], 0)
+        conn.close()
+
+    def test_missing_table(self):
+        with self.assertRaisesRegex(ValueError, "social_media_sentiment"):
+            score_unscored_posts(sqlite3.connect(":memory:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
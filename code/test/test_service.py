@@ -0,0 +1,72 @@
+import unittest
+
+from starlette.testclient import TestClient
+
+from service import app
+
+
+class TestRecommendationService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client_context = TestClient(app)
+        cls.client = cls.client_context.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client_context.__exit__(None, None, None)
+
+    def test_health(self):
+        response = self.client.get("/health")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "ok")
+
+    def test_metrics(self):
+        self.client.get("/customers/CUST2025B/recommendations")
+        body = self.client.get("/metrics").json()
+        stats = body["recommendation_flights"]
+        self.assertGreaterEqual(stats["executions"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertIn("depth", body["change_queue"])
+
+    def test_customer_recommendations(self):
+        response = self.client.get("/customers/CUST2025A/recommendations")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["customer_id"], "CUST2025A")
+        self.assertEqual(body["type"], "individual")
+        self.assertIsInstance(body["products"], list)
+
+    def test_customer_recommendations_without_rationale(self):
+        response = self.client.get("/customers/ORG_US_004/recommendations?rationale=false")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["rationale"])
+
+    def test_rejects_unknown_rationale_flag(self):
+        response = self.client.get("/customers/ORG_US_004/recommendations?rationale=maybe")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/customers/ORG_US_004/recommendations?rationale=off")
+        self.assertIsNone(response.json()["rationale"])
+
+    def test_unknown_customer(self):
+        response = self.client.get("/customers/INVALID_ID/recommendations")
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_recommendations(self):
+        response = self.client.post("/recommendations:batch", json={
+            "customer_ids": ["CUST2025A", "ORG_US_004", "INVALID_ID"],
+            "rationale": False,
+        })
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([r["customer_id"] for r in body["results"]], ["CUST2025A", "ORG_US_004"])
+        self.assertEqual(body["not_found"], ["INVALID_ID"])
+
+    def test_batch_rejects_bad_payload(self):
+        response = self.client.post("/recommendations:batch", json={"customer_ids": "CUST2025A"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/recommendations:batch", json={"customer_ids": ["CUST2025A"], "rationale": "false"})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import threading
+import time
+import unittest
+
+from singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        executions = []
+
+        def slow(value):
+            executions.append(value)
+            started.set()
+            release.wait(5)
+            return value * 2
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do("k", slow, 21)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flights.do("k", slow, 21))) for _ in range(4)]
+        for t in followers:
+            t.start()
+        while flights.stats()["coalesced"] < 4:
+            time.sleep(0.01)
+        release.set()
+        for t in [leader] + followers:
+            t.join(5)
+
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(executions, [21])
+        self.assertEqual(flights.stats(), {"calls": 5, "executions": 1, "coalesced": 4, "errors": 0, "in_flight": 0})
+
+    def test_sequential_calls_are_not_cached(self):
+        flights = SingleFlight()
+        self.assertEqual(flights.do("k", lambda: 1), 1)
+        self.assertEqual(flights.do("k", lambda: 2), 2)
+        self.assertEqual(flights.stats()["executions"], 2)
+
+    def test_errors_propagate_and_clear_key(self):
+        flights = SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            flights.do("k", fail)
+        self.assertEqual(flights.do("k", lambda: "ok"), "ok")
+        self.assertEqual(flights.stats()["errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()